@@ -45,6 +45,12 @@ def enable_output_option(parser):
                         'files.',
                         default='.')
 
+def enable_jobs_option(parser):
+    parser.add_argument('-j', metavar='jobs', type=int,
+                        help = 'Number of processes to use when all result ' \
+                        'pages are created. Default is 1.',
+                        default=1)
+
 def get_options(parser):
     options = parser.parse_args()
 
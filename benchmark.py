@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+    benchmark.py
+
+    Generates synthetic races of different sizes and measures how long the
+    main steps of lapmaster take for them: loading the configuration and the
+    log, updating the report, creating the result pages and saving the log.
+    The results are written as JSON so that they can be compared between
+    versions.
+
+    :copyright: (c) 2016 by Robert Johansson.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import argparse
+import lmcore
+import htmlgen
+import makeconfig
+
+START_TIME = 1439035200
+RACE_LENGTH = 12 * 3600
+
+# Number of teams per class (see makeconfig) and number of laps in the race
+SIZES = {
+    'small': ({'ms': 25, 'ls': 8, 't3m': 40, 't3l': 5, 't6m': 3}, 5000),
+    'medium': ({'ms': 99, 'ls': 99, 't3m': 99, 't3l': 99, 't6m': 99}, 30000),
+    'large': ({'ms': 300, 'ls': 300, 't3m': 300, 't3l': 300, 't6m': 300},
+              100000),
+}
+
+# Number of laps at the end of the log that are registered one at a time,
+# with pages created after each of them
+SINGLE_LAPS = 20
+
+# Writes a log for a race where all classes start at START_TIME and each team
+# rides laps of random length until there are lapCount laps in total. The
+# members of a team take turns.
+def write_log(path, teams, lapCount, seed):
+    rnd = random.Random(seed)
+    meanLapTime = float(RACE_LENGTH) * len(teams) / lapCount
+    laps = []
+    for cid, teamId, bibs in teams:
+        lapTime = meanLapTime * rnd.uniform(0.8, 1.2)
+        t = START_TIME
+        lap = 0
+        while True:
+            t += lapTime * rnd.uniform(0.9, 1.1)
+            if t > START_TIME + RACE_LENGTH:
+                break
+            laps.append((round(t, 2), bibs[lap % len(bibs)]))
+            lap += 1
+    laps.sort()
+    with open(path, 'w') as f:
+        f.write("%d,start all\n" % (START_TIME))
+        for t, bib in laps[:lapCount]:
+            f.write("%.2f,%d\n" % (t, bib))
+    return min(lapCount, len(laps))
+
+class Timer:
+    def __init__(self):
+        self.Start = time.time()
+
+    def elapsed(self):
+        return time.time() - self.Start
+
+def run(name, counts, lapCount, seed, pages, processes=1):
+    directory = tempfile.mkdtemp(prefix='lapmaster-' + name + '-')
+    try:
+        teams = makeconfig.write_config(directory, counts)
+        logPath = os.path.join(directory, 'log.csv')
+        laps = write_log(logPath, teams, lapCount, seed)
+        result = {'size': name,
+                  'teams': len(teams),
+                  'persons': sum([len(bibs) for cid, teamId, bibs in teams]),
+                  'laps': laps}
+        timings = {}
+
+        timer = Timer()
+        config = lmcore.loadConfig(
+            os.path.join(directory, makeconfig.CLASSFILE),
+            os.path.join(directory, makeconfig.PERSONFILE),
+            os.path.join(directory, makeconfig.TEAMFILE))
+        timings['loadConfig'] = timer.elapsed()
+
+        timer = Timer()
+        log, startInfo = lmcore.loadLog(logPath, config)
+        timings['loadLog'] = timer.elapsed()
+
+        # The first load makes the index, the second uses it
+        lmcore.loadLog(logPath, config, useIndex=True)
+        timer = Timer()
+        lmcore.loadLog(logPath, config, useIndex=True)
+        timings['loadLog with index'] = timer.elapsed()
+
+        with open(logPath, 'r') as f:
+            lines = f.readlines()
+        report = lmcore.Report(config)
+        timer = Timer()
+        for line in lines[:-SINGLE_LAPS]:
+            report.update(line)
+        elapsed = timer.elapsed()
+        timings['Report.update'] = elapsed
+        timings['Report.update per second'] = \
+            (len(lines) - SINGLE_LAPS) / elapsed
+
+        if pages:
+            outputDir = os.path.join(directory, 'html')
+            os.mkdir(outputDir)
+            generator = htmlgen.HTMLGenerator(config, report, outputDir,
+                                              processes)
+            timer = Timer()
+            generator.createPages(0, full=True)
+            timings['createPages full'] = timer.elapsed()
+
+            timer = Timer()
+            for stamp, line in enumerate(lines[-SINGLE_LAPS:]):
+                report.update(line)
+                generator.createPages(stamp + 1)
+            timings['createPages per lap'] = timer.elapsed() / SINGLE_LAPS
+            generator.close()
+
+        savePath = os.path.join(directory, 'saved.csv')
+        timer = Timer()
+        lmcore.saveLog(log, savePath)
+        timings['saveLog'] = timer.elapsed()
+
+        timer = Timer()
+        for i in range(SINGLE_LAPS):
+            log.append(START_TIME + RACE_LENGTH + i, '101')
+            lmcore.appendLog(log, savePath)
+        timings['appendLog'] = timer.elapsed() / SINGLE_LAPS
+
+        result['timings'] = timings
+        return result
+    finally:
+        shutil.rmtree(directory)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Measures lapmaster performance on synthetic races.')
+    parser.add_argument('-s', metavar='sizes', default='small,medium',
+                        help='Comma separated list of race sizes to run. ' \
+                        'Available sizes are %s. Default is small,medium.' % \
+                        (', '.join(sorted(SIZES.keys()))))
+    parser.add_argument('-o', metavar='file',
+                        help='Write results to file instead of stdout.')
+    parser.add_argument('--seed', type=int, default=1,
+                        help='Seed for generating races.')
+    parser.add_argument('--no-pages', action='store_true',
+                        help='Do not measure page creation.')
+    parser.add_argument('-j', metavar='jobs', type=int, default=1,
+                        help='Number of processes to create all pages with.')
+    options = parser.parse_args()
+    lmcore.stats.dump_at_exit()
+
+    results = []
+    for name in options.s.split(','):
+        if not name in SIZES:
+            sys.stderr.write("Unknown size " + name + os.linesep)
+            sys.exit(1)
+        counts, lapCount = SIZES[name]
+        sys.stderr.write("Running " + name + os.linesep)
+        results.append(run(name, counts, lapCount, options.seed,
+                           not options.no_pages, options.j))
+
+    text = json.dumps({'results': results}, indent=2, sort_keys=True)
+    if options.o:
+        with open(options.o, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == '__main__':
+    main()
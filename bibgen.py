@@ -12,14 +12,15 @@
 
 import math
 import cairo
-import poppler
 import lmcore
 import datetime
+import multiprocessing
+import os
+import shutil
+import subprocess
 import sys
 import getopt
-
-today = datetime.date.today()
-year = today.strftime('%Y')
+import tempfile
 
 A4_size_mm = [210.0, 297.0]
 
@@ -29,35 +30,6 @@ def mm_to_inch(iterable):
 def inch_to_point(iterable):
     return [i * 72.0 for i in iterable]
 
-def print_text(ctx, text, size, x, y, scale, color):
-    ctx.save()
-    ctx.set_font_size(size)
-    m = ctx.get_font_matrix()
-    m.scale(scale[0], scale[1])
-    ctx.set_font_matrix(m)
-    ctx.move_to(x, y)
-    ctx.set_source_rgb(color[0], color[1], color[2])
-    ctx.show_text(text)
-    ctx.restore()
-
-def center_text(ctx, text, size, center, y, scale, color):
-    ctx.save()
-    ctx.set_font_size(size)
-    m = ctx.get_font_matrix()
-    m.scale(scale[0], scale[1])
-    ctx.set_font_matrix(m)
-    e = ctx.text_extents(text)
-    x = center - e[2] / 2.0
-    y -= e[1]
-    x -= e[0]
-    ctx.move_to(x, y)
-    ctx.set_source_rgb(color[0], color[1], color[2])
-    ctx.show_text(text)
-    ctx.restore()
-
-def add_logo(pageCtx, logoCtx):
-    pass
-
 WIDTH_MM = A4_size_mm[0]
 HEIGHT_MM = A4_size_mm[1]
 
@@ -66,45 +38,83 @@ A4_size_points = inch_to_point(mm_to_inch(A4_size_mm))
 WIDTH_POINTS = A4_size_points[0]
 HEIGHT_POINTS = A4_size_points[1]
 
-surface = cairo.PDFSurface('bibs.pdf', WIDTH_POINTS, HEIGHT_POINTS)
-
 WIDTH = WIDTH_POINTS
 HEIGHT = HEIGHT_POINTS
 
-ctx = cairo.Context(surface)
-
-ctx.scale(WIDTH, WIDTH)
-
-def show_usage():
-    print(("Usage %s -b <text> -i <image>" % \
-        (os.path.basename(sys.argv[0]))))
-    print("Generates bibs for printing.")
-    print(" -b\tText to print on the back side of each bib")
-    print(" -i\tImage to display on each bib. Must be in png format.")
-
-try:
-    opts, args = getopt.getopt(sys.argv[1:], "b:i:")
-except getopt.GetoptError as err:
-    show_usage()
-    sys.exit(-1)
+# Number of bibs on each page
+BIBS_PER_PAGE = 2
+# Scale of the logo on the page and the resolution it is kept in. The image
+# is scaled down to this resolution once instead of the full size image
+# being put on every bib.
+LOGO_SCALE = 0.06
+LOGO_DPI = 300.0
+
+# Font matrix for text of size with the glyphs scaled by scale
+def font_matrix(size, scale):
+    return cairo.Matrix(size * scale[0], 0.0, 0.0, size * scale[1], 0.0, 0.0)
+
+# Positions and fonts of everything on a page, computed once. Positions are
+# given in page widths.
+class Layout:
+    def __init__(self, year):
+        self.NameFont = font_matrix(0.02, [1.1, 1.0])
+        self.BibFont = font_matrix(0.36, [0.95, 1.0])
+        self.RaceFont = font_matrix(0.06, [1.1, 1.0])
+        self.BackFont = font_matrix(0.05, [0.95, 1.0])
+        self.RaceText = 'ML12h ' + str(year)
+
+        base_bib_y = 0.29
+        base_ml_y = 0.65
+        dy = 100.0 / WIDTH_MM
+        # (name y, bib y, race text y) of each bib on a page, top first
+        self.Slots = []
+        for slot in range(BIBS_PER_PAGE):
+            self.Slots.append((base_ml_y + 0.03 + slot * dy,
+                               base_bib_y + slot * dy,
+                               base_ml_y + slot * dy))
+
+        height = float(HEIGHT_MM) / float(WIDTH_MM)
+        half = height / 2
+        half_text_height = 0.05 / 2
+        bib_height = 100.0 / WIDTH_MM
+        # y of the text on the back side of each bib
+        self.BackY = [half - bib_height / 2 - half_text_height,
+                      half + bib_height / 2 - half_text_height]
+
+# Returns (surface, scale) of the image at path scaled down to LOGO_DPI,
+# where scale is what the surface has to be scaled by to be drawn in the size
+# of the logo.
+def create_logo(path):
+    image = cairo.ImageSurface.create_from_png(path)
+    factor = min(1.0, LOGO_SCALE * LOGO_DPI / 72.0)
+    width = int(math.ceil(image.get_width() * factor))
+    height = int(math.ceil(image.get_height() * factor))
+    logo = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+    ctx = cairo.Context(logo)
+    ctx.scale(factor, factor)
+    ctx.set_source_surface(image)
+    ctx.paint()
+    return logo, LOGO_SCALE / factor
 
-message = None
-image_file = None
+def print_text(ctx, text, font, x, y):
+    ctx.set_font_matrix(font)
+    ctx.move_to(x, y)
+    ctx.show_text(text)
 
-for o, a in opts:
-    if o == '-b':
-        message = a
-    if o == '-i':
-        image_file = a
+def center_text(ctx, text, font, center, y):
+    ctx.set_font_matrix(font)
+    e = ctx.text_extents(text)
+    ctx.move_to(center - e[2] / 2.0 - e[0], y - e[1])
+    ctx.show_text(text)
 
-def white_background():
+def white_background(ctx):
     ctx.save()
     ctx.set_source_rgb(1.0, 1.0, 1.0)
     ctx.rectangle(0.0, 0.0, 1.0, math.sqrt(2.0))
     ctx.fill()
     ctx.restore()
 
-def draw_cut_lines():
+def draw_cut_lines(ctx):
     ctx.save()
     ctx.set_source_rgb(0.0, 0.0, 0.0)
     ctx.set_dash([0.01, 0.01])
@@ -134,83 +144,167 @@ def draw_cut_lines():
     ctx.stroke()
     ctx.restore()
 
+def draw_bib(ctx, layout, slot, bib, name, logo):
+    name_y, bib_y, ml_y = layout.Slots[slot]
+    ctx.set_source_rgb(0.0, 0.0, 0.0)
+    print_text(ctx, name, layout.NameFont, 0.16, name_y)
+    center_text(ctx, str(bib), layout.BibFont, 0.5, bib_y)
+    print_text(ctx, layout.RaceText, layout.RaceFont, 0.16, ml_y)
 
-ctx.select_font_face('Free Sans',
-                     cairo.FONT_SLANT_NORMAL,
-                     cairo.FONT_WEIGHT_BOLD)
-
-white_background()
-draw_cut_lines()
-
-base_bib_y = 0.29
-base_ml_y = 0.65
-dy = 100.0 / WIDTH_MM
-
-config = lmcore.configloader.loadConfig('classes.csv',
-                                        'persons.csv',
-                                        'teams.csv')
-
-if config is None:
-    print("Errors in configuration. PDF not created.")
-    sys.exit(1)
-
-odd = True
-count = 0
-
-import os
-pwd = os.getcwd()
-
-image_surface = cairo.ImageSurface.create_from_png(image_file)
-
-def create_backside(ctx, text):
-    if text is None:
+    if logo is None:
         return
-    height = float(HEIGHT_MM) / float(WIDTH_MM)
-    half = height / 2
-    quarter = half / 2
-    text_height = 0.05
-    half_text_height = text_height / 2
-    bib_height = 100.0 / WIDTH_MM
-    center_text(ctx, text, text_height, 0.5, half - bib_height / 2 - half_text_height, [0.95, 1.0], [0, 0, 0])
-    center_text(ctx, text, text_height, 0.5, half + bib_height / 2 - half_text_height, [0.95, 1.0], [0, 0, 0])
-    surface.show_page()
-    white_background()
-
-for num in config.getPersonBibList():
-    name = config.getPersonNameByBib(num)
-    if odd:
-        name_y = base_ml_y + 0.03
-        bib_y = base_bib_y
-        ml_y = base_ml_y
-    else:
-        name_y = base_ml_y + 0.03 + dy
-        bib_y = base_bib_y + dy
-        ml_y = base_ml_y + dy
-
-    print_text(ctx, name, 0.02, 0.16, name_y, [1.1, 1.0], [0, 0, 0] )
-
-    center_text(ctx, str(num), 0.36, 0.5, bib_y, [0.95, 1.0], [0, 0, 0])
-    print_text(ctx, 'ML12h ' + str(year), 0.06, 0.16, ml_y, [1.1, 1.0],
-                [0, 0, 0])
-
+    surface, scale = logo
     ctx.save()
     ctx.identity_matrix()
     ctx.set_operator(cairo.OPERATOR_OVER)
-    #ctx.scale(scale, scale)
-    #logo_y = (ml_y) * 2398 * 4.0
-    #ctx.translate(0, logo_y)
-    scale = 0.06
     ctx.translate(0.58 * WIDTH_POINTS, 550 * ml_y)
     ctx.scale(scale, scale)
-    #logo_y = (ml_y) * 2398 * 4.0
-    ctx.set_source_surface(image_surface)
+    ctx.set_source_surface(surface)
     ctx.paint()
     ctx.restore()
 
-    odd = not odd
-    count += 1
-    if count % 2 == 0:
+def draw_backside(ctx, layout, text):
+    ctx.set_source_rgb(0.0, 0.0, 0.0)
+    for y in layout.BackY:
+        center_text(ctx, text, layout.BackFont, 0.5, y)
+
+# Renders bibs, a list of (bib, name), to a PDF at path. Each page holds
+# BIBS_PER_PAGE bibs and is followed by a page with message, if given, to
+# print on the back side.
+def render_bibs(path, bibs, message, image_file, year):
+    surface = cairo.PDFSurface(path, WIDTH_POINTS, HEIGHT_POINTS)
+    ctx = cairo.Context(surface)
+    ctx.scale(WIDTH, WIDTH)
+    ctx.select_font_face('Free Sans',
+                         cairo.FONT_SLANT_NORMAL,
+                         cairo.FONT_WEIGHT_BOLD)
+
+    layout = Layout(year)
+    logo = None
+    if image_file is not None:
+        logo = create_logo(image_file)
+
+    for start in range(0, len(bibs), BIBS_PER_PAGE):
+        white_background(ctx)
+        draw_cut_lines(ctx)
+        for slot, (bib, name) in enumerate(bibs[start:start + BIBS_PER_PAGE]):
+            draw_bib(ctx, layout, slot, bib, name, logo)
         surface.show_page()
-        white_background()
-        create_backside(ctx, message)
-        draw_cut_lines()
+        if message is not None:
+            white_background(ctx)
+            draw_backside(ctx, layout, message)
+            surface.show_page()
+    surface.finish()
+    return path
+
+def render_chunk(chunk):
+    return render_bibs(*chunk)
+
+# Renders bibs to output, split into page aligned chunks that are rendered
+# by processes worker processes and then joined with pdfunite from poppler.
+# Without pdfunite the bibs are rendered in one process.
+def generate(output, bibs, message, image_file, year, processes=1):
+    pages = (len(bibs) + BIBS_PER_PAGE - 1) // BIBS_PER_PAGE
+    processes = max(1, min(processes, pages))
+    if processes > 1 and shutil.which('pdfunite') is None:
+        print("pdfunite from poppler-utils was not found. "
+              "Generating bibs in one process.")
+        processes = 1
+    if processes == 1:
+        render_bibs(output, bibs, message, image_file, year)
+        return
+
+    chunk_size = (pages + processes - 1) // processes * BIBS_PER_PAGE
+    tmpdir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(output)))
+    try:
+        chunks = []
+        for start in range(0, len(bibs), chunk_size):
+            path = os.path.join(tmpdir, "%06d.pdf" % (len(chunks)))
+            chunks.append((path, bibs[start:start + chunk_size], message,
+                           image_file, year))
+        pool = multiprocessing.Pool(processes)
+        try:
+            paths = pool.map(render_chunk, chunks)
+        finally:
+            pool.close()
+            pool.join()
+        merged = os.path.join(tmpdir, "bibs.pdf")
+        subprocess.check_call(['pdfunite'] + paths + [merged])
+        os.rename(merged, output)
+    finally:
+        shutil.rmtree(tmpdir)
+
+# Returns the set of bibs in text, e.g. "101,102,300-310"
+def parse_bibs(text):
+    bibs = set()
+    for part in text.split(','):
+        part = part.strip()
+        if '-' in part:
+            first, last = part.split('-', 1)
+            bibs.update(range(int(first), int(last) + 1))
+        elif part:
+            bibs.add(int(part))
+    return bibs
+
+def show_usage():
+    print(("Usage %s -b <text> -i <image> [-n <bibs>] [-o <file>] [-j <jobs>]"
+           % (os.path.basename(sys.argv[0]))))
+    print("Generates bibs for printing.")
+    print(" -b\tText to print on the back side of each bib")
+    print(" -i\tImage to display on each bib. Must be in png format.")
+    print(" -n\tOnly generate these bibs, e.g. 101,102,300-310")
+    print(" -o\tPDF file to write. Default is bibs.pdf.")
+    print(" -j\tNumber of processes to render with. Default is 1.")
+    print("   \tMore than one needs pdfunite from poppler-utils.")
+
+def main():
+    try:
+        opts, args = getopt.getopt(sys.argv[1:], "b:i:n:o:j:")
+    except getopt.GetoptError as err:
+        show_usage()
+        sys.exit(-1)
+
+    message = None
+    image_file = None
+    selected = None
+    output = 'bibs.pdf'
+    processes = 1
+
+    try:
+        for o, a in opts:
+            if o == '-b':
+                message = a
+            if o == '-i':
+                image_file = a
+            if o == '-n':
+                selected = parse_bibs(a)
+            if o == '-o':
+                output = a
+            if o == '-j':
+                processes = int(a)
+    except ValueError:
+        show_usage()
+        sys.exit(-1)
+
+    config = lmcore.configloader.loadConfig('classes.csv',
+                                            'persons.csv',
+                                            'teams.csv')
+
+    if config is None:
+        print("Errors in configuration. PDF not created.")
+        sys.exit(1)
+
+    numbers = config.getPersonBibList()
+    if selected is not None:
+        unknown = selected.difference(numbers)
+        if len(unknown) > 0:
+            print("Unknown bibs: " + ", ".join(str(b) for b in sorted(unknown)))
+            sys.exit(1)
+        numbers = [num for num in numbers if num in selected]
+
+    bibs = [(num, config.getPersonNameByBib(num)) for num in numbers]
+    year = datetime.date.today().strftime('%Y')
+    generate(output, bibs, message, image_file, year, processes)
+
+if __name__ == '__main__':
+    main()
@@ -16,6 +16,9 @@ from datetime import datetime
 import time
 import xmlrpc.client
 
+# XML-RPC fault code for a method that the server does not have
+METHOD_NOT_FOUND = -32601
+
 def Log(msg):
     print('%s: %s' % (datetime.isoformat(datetime.now()), msg))
     pass
@@ -35,14 +38,27 @@ class FileError(Exception):
         return repr(self.descripton)
 
 class RemoteDB:
+    # Number of calls sent in one request by the batched methods
+    BATCH_SIZE = 50
+
     def __init__(self, url, password, race_id):
+        # The proxy keeps its HTTP connection open between calls
         self.server = xmlrpc.client.ServerProxy('%s/xmlrpc.php' % url)
         self.race_id = race_id
+        # Set to False when the server turns out not to support
+        # system.multicall
+        self.multicall = True
 
     def UploadData(self, data):
         resp = self.server.ml12h_racetimer_upload_data(self.race_id, data)
         return resp
 
+    def AppendData(self, data):
+        # Like UploadData, but data only holds laps to add to the ones
+        # already uploaded. Servers without this method raise a Fault.
+        resp = self.server.ml12h_racetimer_append_data(self.race_id, data)
+        return resp
+
     def DeleteLaps(self):
         resp = self.server.ml12h_racetimer_delete_laps(self.race_id)
         return resp
@@ -55,6 +71,54 @@ class RemoteDB:
         resp = self.server.ml12h_racetimer_set_bib(self.race_id, rider_id, bib)
         return resp
 
+    def SetRiderBibs(self, changes):
+        # Sets the bibs of many riders in a few requests. changes is a list
+        # of (rider_id, bib). Returns a list with the result of each change,
+        # in the same order, which is what SetRiderBib returns or the Fault
+        # of a change that failed.
+        calls = [('ml12h_racetimer_set_bib', (self.race_id, rider_id, bib))
+                 for rider_id, bib in changes]
+        return self._call_batched(calls)
+
+    def _call_batched(self, calls):
+        results = []
+        for start in range(0, len(calls), self.BATCH_SIZE):
+            batch = calls[start:start + self.BATCH_SIZE]
+            if self.multicall:
+                try:
+                    results += self._multicall(batch)
+                    continue
+                except xmlrpc.client.Fault as error:
+                    # Only a server without multicall stops it for good.
+                    # Other faults, e.g. a temporary server error, only
+                    # make this batch be sent one call at a time.
+                    if error.faultCode == METHOD_NOT_FOUND:
+                        Log('Server does not support multicall, sending one '
+                            'call at a time')
+                        self.multicall = False
+                    else:
+                        Log('Multicall failed, sending the batch one call '
+                            'at a time: %s' % (error))
+            for method, params in batch:
+                try:
+                    results.append(getattr(self.server, method)(*params))
+                except xmlrpc.client.Fault as fault:
+                    results.append(fault)
+        return results
+
+    def _multicall(self, calls):
+        multicall = xmlrpc.client.MultiCall(self.server)
+        for method, params in calls:
+            getattr(multicall, method)(*params)
+        response = multicall()
+        results = []
+        for i in range(len(calls)):
+            try:
+                results.append(response[i])
+            except xmlrpc.client.Fault as fault:
+                results.append(fault)
+        return results
+
     def GetTeamsRiders(self):
         resp = self.server.ml12h_racetimer_get_teams_riders(self.race_id)
         return resp
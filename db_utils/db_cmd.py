@@ -28,6 +28,16 @@ class Rider:
         else:
             return self.team < other.team
 
+# Sends bib changes, a list of (rider_id, bib), in batches and logs the
+# changes that failed. Returns the results from RemoteDB.SetRiderBibs.
+def setRiderBibs(db, changes):
+    results = db.SetRiderBibs(changes)
+    for (nid, bib), res in zip(changes, results):
+        if isinstance(res, xmlrpc.client.Fault):
+            Log('Could not set bib of {} to {}: {}'.format(nid, bib,
+                                                          res.faultString))
+    return results
+
 class TimeFormat:
     def __init__(self, timestamp):
         self.dt = datetime.fromtimestamp(timestamp)
@@ -89,10 +99,12 @@ class CmdDeleteBibs:
         self.db = db
 
     def execute(self, args):
+        changes = []
         for nid, data in self.db.GetTeamsRiders().items():
             if data['bib'] != '':
                 Log('Delete bib for {}({})'.format(data['name'], data['bib']))
-                db_res = self.db.SetRiderBib(nid, '')
+                changes.append((nid, ''))
+        setRiderBibs(self.db, changes)
         return ''
 
 class CmdListRiders:
@@ -151,16 +163,24 @@ class CmdSetBib:
                               info['team_name'],
                               info['team_nid']) for nid, info in res.items()}
 
-        for nid, r in sorted(riders.items()):
-            if r.bib == '':
-                print('Nid: {}, Rider: {}, Team: {}, Bib: {}'.format(nid, r.name,  r.team, r.bib))
-                print('Propose bib: ', end=' ')
-                resp = sys.stdin.readline().strip()
-                try:
-                    bib = int(resp)
-                    self.setSingleRider(nid, bib)
-                except ValueError:
-                    pass
+        # The bibs are sent together when all riders have been asked, or
+        # when the input is interrupted
+        changes = []
+        try:
+            for nid, r in sorted(riders.items()):
+                if r.bib == '':
+                    print('Nid: {}, Rider: {}, Team: {}, Bib: {}'.format(nid, r.name,  r.team, r.bib))
+                    print('Propose bib: ', end=' ')
+                    resp = sys.stdin.readline().strip()
+                    try:
+                        changes.append((nid, int(resp)))
+                    except ValueError:
+                        pass
+        finally:
+            results = setRiderBibs(self.db, changes)
+            for res in results:
+                if not isinstance(res, xmlrpc.client.Fault):
+                    print("Set rider bib for %s to %s" % (res['name'], res['bib']))
 
     def execute(self, args):
         if len(args) == 3:
@@ -404,6 +424,7 @@ class CmdProposeBib:
                                                            r['proposed_bib'],
                                                            r['reason']))
             if setBib:
+                accepted = []
                 for r in proposed:
                     print(('Propose: Change bib of {} in '
                            'DB from {} to {}. Y/n?').format(r['name'],
@@ -411,11 +432,16 @@ class CmdProposeBib:
                                                             r['proposed_bib']))
                     resp = sys.stdin.readline().strip()
                     if len(resp) == 0 or resp == 'y' or resp == 'Y':
-                        db_res = self.db.SetRiderBib(r['nid'], r['proposed_bib'])
-                        print("Rider bib for %s set to %s" % (r['name'], db_res['bib']))
+                        accepted.append(r)
                     else:
                         print("Skipping %s" % r['name'])
 
+                changes = [(r['nid'], r['proposed_bib']) for r in accepted]
+                results = setRiderBibs(self.db, changes)
+                for r, db_res in zip(accepted, results):
+                    if not isinstance(db_res, xmlrpc.client.Fault):
+                        print("Rider bib for %s set to %s" % (r['name'], db_res['bib']))
+
         return 'OK'
 
 class LapParse:
@@ -11,6 +11,7 @@
 from .db_base import *
 import time
 import re
+import hashlib
 
 def Usage():
     print('Usage: db_updload.py <-f input_file> <-u url> ' \
@@ -32,6 +33,12 @@ class Uploader:
         self.Db = db
         self.FileName = filename
         self.Interval = interval
+        # Number of bytes of the file that the server has acknowledged and
+        # the MD5 checksum of them
+        self.Offset = 0
+        self.Digest = None
+        # Cleared if the server does not support appending data
+        self.CanAppend = True
 
     def _RewriteLine(self, line):
         '''This function rewrites a lapmaster / kickass_timer log file line to
@@ -68,32 +75,73 @@ class Uploader:
 
         Log("Exiting")
 
+    def _rewrite(self, data):
+        tweaked_lines = []
+        for line in data.decode('utf-8').splitlines():
+            l = self._RewriteLine(line)
+            if l != None:
+                tweaked_lines.append(l)
+        return '\n'.join([l for l in tweaked_lines])
+
+    def _log_result(self, res, duration):
+        if int(res['deleted']) > 0 or len(res['added']) > 0:
+            Log("Uploaded data to server in %02fs" % (duration))
+            Log("Removed: %d laps" % res['deleted'])
+            Log("Added:")
+            for added in res['added']:
+                Log("  %d\tat %s" % (int(added['bib']),
+                                     time.strftime("%H:%M:%S",
+                                                   time.localtime(float(added['passage'])))))
+        if len(res['messages']) > 0:
+            for msg in res['messages']:
+                Log(msg)
+
+    # Returns True if the first Offset bytes of data are the ones that have
+    # already been uploaded
+    def _is_uploaded_prefix(self, data):
+        if self.Digest is None or len(data) < self.Offset:
+            return False
+        return hashlib.md5(data[:self.Offset]).hexdigest() == self.Digest
+
     def _upload(self):
         try:
-            with open(self.FileName, 'r') as f:
-                tweaked_lines = []
-                for line in f:
-                    l = self._RewriteLine(line)
-                    if l != None:
-                        tweaked_lines.append(l)
-
-                data = '\n'.join([l for l in tweaked_lines])
-
-                before = time.time()
-                res = self.Db.UploadData(data)
-                after = time.time()
-                if int(res['deleted']) > 0 or len(res['added']) > 0:
-                    Log("Uploaded data to server in %02fs" % (after - before))
-                    Log("Removed: %d laps" % res['deleted'])
-                    Log("Added:")
-                    for added in res['added']:
-                        Log("  %d\tat %s" % (int(added['bib']),
-                                             time.strftime("%H:%M:%S",
-                                                           time.localtime(float(added['passage'])))))
-                if len(res['messages']) > 0:
-                    for msg in res['messages']:
-                        Log(msg)
-        except xmlrpclib.Fault as error:
+            with open(self.FileName, 'rb') as f:
+                data = f.read()
+            # Only upload complete lines
+            data = data[:data.rfind(b'\n') + 1]
+
+            before = time.time()
+            if self.CanAppend and self._is_uploaded_prefix(data):
+                text = self._rewrite(data[self.Offset:])
+                res = None
+                if len(text) > 0:
+                    # If the append fails without an answer, the server may
+                    # still have added the laps. Forget what has been
+                    # uploaded until it answers, so that all data is
+                    # uploaded next time instead of the laps again.
+                    self.Digest = None
+                    try:
+                        res = self.Db.AppendData(text)
+                    except xmlrpc.client.Fault as error:
+                        if error.faultCode == METHOD_NOT_FOUND:
+                            Log('Server does not support appending data. '
+                                'Uploading all data from now on.')
+                            self.CanAppend = False
+                        else:
+                            Log('Appending data failed: %d, %s. Uploading '
+                                'all data.' % (error.faultCode,
+                                               error.faultString))
+                        res = self.Db.UploadData(self._rewrite(data))
+            else:
+                res = self.Db.UploadData(self._rewrite(data))
+            after = time.time()
+
+            self.Offset = len(data)
+            self.Digest = hashlib.md5(data).hexdigest()
+
+            if res is not None:
+                self._log_result(res, after - before)
+        except xmlrpc.client.Fault as error:
             Log('XMLRPC error: %d, %s' % (error.faultCode, error.faultString))
         except NetworkError:
             Log('Upload failed due to network error')
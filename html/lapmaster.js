@@ -4,26 +4,194 @@ if (typeof LM === 'undefined') {
     LM.poll_interval = 500;
     LM.clock_interval = 1000;
     LM.stamp = null;
+    LM.page = null;
+    // True while the page is being updated from the JSON API
+    LM.updating = false;
+    // Latest version stamp the server has announced
+    LM.latest = null;
 }
 
 LM.init = function()
 {
     LM.stamp = document.getElementById("versionstamp").getAttribute("versionstamp")
+    LM.page = location.pathname.split("/").pop() || "index.html";
     LM.update_clock();
-    setTimeout(LM.check_stamp, LM.poll_interval);
+    if (typeof EventSource !== 'undefined') {
+        LM.listen();
+    }
+    else {
+        setTimeout(LM.check_stamp, LM.poll_interval);
+    }
     setTimeout(LM.update_clock, LM.clock_interval);
 };
 
+// Waits for the server to push a new version stamp of this page instead of
+// polling for it. The browser reconnects by itself if the stream is closed.
+LM.listen = function() {
+    var source = new EventSource("/events?page=" +
+                                 encodeURIComponent(LM.page) +
+                                 "&stamp=" + encodeURIComponent(LM.stamp));
+    source.onmessage = function(event) {
+        if (event.data != LM.stamp) {
+            if (!LM.update(event.data)) {
+                source.close();
+            }
+        }
+    };
+};
+
+// Brings the page up to date with version stamp. Pages that can be patched
+// in place fetch only what has changed from the JSON API. Other pages are
+// reloaded. Returns false if the page is reloaded.
+LM.update = function(stamp) {
+    LM.latest = stamp;
+    var patch = LM.patchers[LM.page];
+    if (typeof patch === 'undefined') {
+        LM.stamp = stamp;
+        location.reload();
+        return false;
+    }
+    if (!LM.updating) {
+        LM.updating = true;
+        LM.fetch(patch[0], function(data) {
+            if (data === null || data.full || !patch[1](data)) {
+                location.reload();
+                return;
+            }
+            LM.stamp = String(data.stamp);
+            LM.updating = false;
+            if (LM.latest != LM.stamp) {
+                LM.update(LM.latest);
+            }
+        });
+    }
+    return true;
+};
+
+// Gets what has changed since LM.stamp from the JSON API. callback is given
+// the answer, or null if the request failed.
+LM.fetch = function(path, callback) {
+    var xhr = new XMLHttpRequest();
+    xhr.open("GET", path + "?since=" + encodeURIComponent(LM.stamp));
+    xhr.onload = function() {
+        if (xhr.status == 200) {
+            callback(JSON.parse(xhr.responseText));
+        }
+        else {
+            callback(null);
+        }
+    };
+    xhr.onerror = function() {
+        callback(null);
+    };
+    xhr.send();
+};
+
+// Returns a new table cell with text, which may be null
+LM.cell = function(text, className) {
+    var td = document.createElement("td");
+    if (className) {
+        td.className = className;
+    }
+    if (text) {
+        td.textContent = String(text);
+    }
+    return td;
+};
+
+// Returns a new table cell with a link
+LM.link_cell = function(text, href, className) {
+    var td = LM.cell(null, className);
+    var a = document.createElement("a");
+    a.setAttribute("href", href);
+    a.textContent = text;
+    td.appendChild(a);
+    return td;
+};
+
+LM.standing_row = function(row) {
+    var tr = document.createElement("tr");
+    tr.id = "t" + row.id;
+    tr.appendChild(LM.cell(row.rank, "number"));
+    tr.appendChild(LM.link_cell(row.name, row.href, "teamname"));
+    tr.appendChild(LM.cell(row.laps, "number"));
+    tr.appendChild(LM.cell(row.time));
+    tr.appendChild(LM.cell(row.lapTime));
+    tr.appendChild(LM.cell(row.lag));
+    tr.appendChild(LM.cell(row.lead));
+    return tr;
+};
+
+LM.logtail_row = function(row) {
+    var tr = document.createElement("tr");
+    tr.appendChild(LM.cell(row.time));
+    tr.appendChild(LM.cell(row.bib, "number"));
+    tr.appendChild(LM.cell(row.rank));
+    tr.appendChild(LM.link_cell(row.name, row.href));
+    tr.appendChild(LM.cell(row.laps, "number"));
+    tr.appendChild(LM.cell(row.lag));
+    tr.appendChild(LM.cell(row.lead));
+    tr.appendChild(LM.cell(row.lapTime));
+    return tr;
+};
+
+// Replaces the changed rows of the class standings and puts the rows in
+// rank order. Returns false if the page does not have the rows to patch.
+LM.patch_standings = function(data) {
+    for (var i = 0; i < data.classes.length; i++) {
+        var clazz = data.classes[i];
+        var tbody = document.getElementById("c" + clazz.id);
+        if (tbody === null) {
+            return false;
+        }
+        for (var j = 0; j < clazz.teams.length; j++) {
+            var row = LM.standing_row(clazz.teams[j]);
+            var old = document.getElementById(row.id);
+            if (old === null) {
+                tbody.appendChild(row);
+            }
+            else {
+                tbody.replaceChild(row, old);
+            }
+        }
+        if (typeof clazz.order !== 'undefined') {
+            for (var k = 0; k < clazz.order.length; k++) {
+                tbody.appendChild(document.getElementById("t" + clazz.order[k]));
+            }
+        }
+    }
+    return true;
+};
+
+// Replaces all rows of the log tail, since the rank and lap count of older
+// rows change when their team registers a lap
+LM.patch_logtail = function(data) {
+    var tbody = document.getElementById("logtail");
+    if (tbody === null) {
+        return false;
+    }
+    while (tbody.rows.length > 0) {
+        tbody.deleteRow(-1);
+    }
+    for (var i = 0; i < data.laps.length; i++) {
+        tbody.appendChild(LM.logtail_row(data.laps[i]));
+    }
+    return true;
+};
+
+// Pages that are patched in place, mapped to the JSON API path to get
+// changes from and the function that patches the page
+LM.patchers = {
+    "index.html": ["/api/standings", LM.patch_standings],
+    "logtail.html": ["/api/logtail", LM.patch_logtail]
+};
+
 LM.check_stamp = function() {
     var xhr = new XMLHttpRequest();
-    xhr.open("GET", "/versionstamp", false);
+    xhr.open("GET", "/versionstamp?page=" + encodeURIComponent(LM.page), false);
     xhr.send();
     var stamp = xhr.responseText;
-    if (stamp != LM.stamp) {
-        LM.stamp = stamp;
-        location.reload();
-    }
-    else {
+    if (stamp == LM.stamp || LM.update(stamp)) {
         setTimeout(LM.check_stamp, LM.poll_interval);
     }
 };
@@ -10,9 +10,64 @@
 
 import os
 import time
+import gzip
+import hashlib
+import multiprocessing
+import concurrent.futures
 import lmcore
+from lmcore import stats
+from lmcore.logger import Error
 
 TAIL_SIZE = 20
+SPEAKER_SIZE = 10
+# Keys of the cells of a speaker row in the order they are shown
+SPEAKER_COLUMNS = ('bib', 'name', 'class', 'team', 'rank', 'previousRank',
+                   'laps', 'lapTime', 'upTeam', 'upTeamLag', 'downTeam',
+                   'downTeamLead')
+
+# The generator used by a worker process when rendering in parallel
+workerGenerator = None
+# Number of the full rebuild whose report state the worker has loaded
+workerRebuild = None
+
+# Creates the generator of a worker process with a report of its own, which
+# is loaded from a checkpoint of the report in the parent process for each
+# full rebuild. If useCache is set the pages are kept so that they can be
+# returned to the parent process.
+def init_worker(config, outputDir, useCache):
+    global workerGenerator
+    cache = None
+    if useCache:
+        cache = PageCache()
+    workerGenerator = HTMLGenerator(config, lmcore.Report(config), outputDir,
+                                    cache=cache)
+
+# Renders a chunk of pages in a worker process. pages is a list of
+# ('c', classId) for class matrix pages and ('p', bib) for person pages.
+# checkpoint is the state of the report for full rebuild number rebuild.
+# Returns a list of (page name, CachedPage) of the pages that were written.
+# The CachedPage is None unless the worker has a cache.
+def render_pages(pages, versionStamp, rebuild, checkpoint):
+    global workerRebuild
+    if workerRebuild != rebuild:
+        workerGenerator.Report.loadCheckpoint(checkpoint)
+        workerRebuild = rebuild
+    workerGenerator.PageStamps = {}
+    cache = workerGenerator.Cache
+    if cache is not None:
+        cache.Pages = {}
+    for kind, key in pages:
+        if kind == 'c':
+            workerGenerator.generateClassMatrixPage(key, versionStamp)
+        else:
+            workerGenerator.generatePersonPage(key, versionStamp)
+    result = []
+    for page in workerGenerator.PageStamps.keys():
+        cachedPage = None
+        if cache is not None:
+            cachedPage = cache.get(page)
+        result.append((page, cachedPage))
+    return result
 
 def time_to_string(t):
     return time.strftime("%H:%M:%S", t)
@@ -20,15 +75,97 @@ def time_to_string(t):
 def laptime_to_string(t):
     return "%(minutes)02d:%(seconds)02d" % {"minutes": t / 60, "seconds":t % 60}
 
+# One version of a page in a PageCache
+class CachedPage:
+    def __init__(self, text, versionStamp):
+        self.Text = text
+        self.VersionStamp = versionStamp
+        self.Data = text.encode('utf-8')
+        self.GzipData = gzip.compress(self.Data)
+        self.ETag = hashlib.md5(self.Data).hexdigest()
+        self.Modified = time.time()
+
+# Keeps the latest version of each page in memory, as is and gzipped, so
+# that pages can be served without reading them from disk.
+class PageCache:
+    def __init__(self):
+        # Mapping from page name to CachedPage. Entries are replaced, never
+        # changed, so readers in other threads always see a whole page.
+        self.Pages = {}
+
+    def store(self, page, text, versionStamp=None):
+        self.add(page, CachedPage(text, versionStamp))
+
+    def add(self, page, cachedPage):
+        self.Pages[page] = cachedPage
+
+    # Returns the CachedPage of a page or None if it has not been stored
+    def get(self, page):
+        return self.Pages.get(page)
+
 class HTMLGenerator:
-    def __init__(self, config, report, outputDir):
+    # Pages are kept in cache, if given, and written to outputDir unless it
+    # is None.
+    def __init__(self, config, report, outputDir, processes=1, cache=None):
         self.Config = config
         self.Report = report
         self.OutputDir = outputDir
+        self.Cache = cache
+        # Number of processes used to render class matrix and person pages
+        # in full rebuilds
+        self.Processes = processes
+        # Worker processes, started here and reused for every full rebuild.
+        # The generator must therefore be created before the program starts
+        # any threads, since forking a process that has started threads,
+        # like the publisher, may deadlock the workers. Unlike
+        # multiprocessing.Pool, the executor notices when a worker has been
+        # killed instead of hanging.
+        self.Pool = None
+        if processes > 1:
+            self.Pool = concurrent.futures.ProcessPoolExecutor(
+                processes, multiprocessing.get_context('fork'), init_worker,
+                (config, outputDir, cache is not None))
+            # The first task starts all workers
+            self.Pool.submit(int).result()
+        # Number of full rebuilds made by the pool
+        self.Rebuilds = 0
+        # Mapping from page name to the version stamp it was last written with
+        self.PageStamps = {}
+        # Number of laps in the report when pages were last created, None if
+        # pages have not been created yet
+        self.RenderedLaps = None
+        self.RenderedResetCount = None
+        self.createStaticParts()
+
+    @stats.timed('HTMLGenerator.writeDoc')
+    def writeDoc(self, doc, outputFile, versionStamp=None):
+        if self.Cache is not None:
+            text = str(doc)
+            self.Cache.store(outputFile, text, versionStamp)
+            if self.OutputDir is not None:
+                self.writeFile(outputFile, text)
+        elif self.OutputDir is not None:
+            self.writeFile(outputFile, doc)
+        if versionStamp is not None:
+            self.PageStamps[outputFile] = versionStamp
+
+    # Writes a page given as text or markup. The page is written to a
+    # temporary file which then replaces the page, so that a page is never
+    # read half written.
+    def writeFile(self, outputFile, page):
+        path = str(self.OutputDir) + os.sep + outputFile
+        tmpPath = "%s.%d.tmp" % (path, os.getpid())
+        with open(tmpPath, "w") as f:
+            if isinstance(page, str):
+                f.write(page)
+            else:
+                page.write(f)
+        os.replace(tmpPath, path)
 
-    def writeDoc(self, doc, outputFile):
-        with open(str(self.OutputDir) + os.sep + outputFile, "w") as f:
-            f.write(str(doc))
+    # Returns the version stamp a page was last written with, or None if the
+    # page has not been written.
+    def getPageStamp(self, outputFile):
+        return self.PageStamps.get(outputFile)
 
     def getClassIdsInSizeOrder(self):
         classIds = self.Config.getClassIdList()
@@ -40,9 +177,10 @@ class HTMLGenerator:
         previousRankText = str(self.Report.getPreviousTeamRanking(teamId))
         return rankText + " (" + previousRankText + ")"
 
-    def createDefaultPage(self, versionStamp):
-        doc = lmcore.MarkupNode('html')
-        head = doc.addChild('head')
+    # Renders the parts of the default page that are the same on all pages,
+    # so that they are not built again for every page.
+    def createStaticParts(self):
+        head = lmcore.MarkupNode('head')
         link = head.addChild('link', "", True)
         link.setAttribute('rel', 'stylesheet')
         link.setAttribute('type', 'text/css')
@@ -51,16 +189,29 @@ class HTMLGenerator:
         meta2.setAttribute('http-equiv', 'Content-type')
         meta2.setAttribute('content', 'text/html')
         meta2.setAttribute('charset', 'UTF-8')
+        self.HeadStart = "".join([str(child) for child in head.Children])
+
+        script = lmcore.MarkupNode('script')
+        script.setAttribute('src', '/static/lapmaster.js')
+        self.HeadEnd = str(script)
+
+        body = lmcore.MarkupNode('body')
+        self.generateNavigationBar(body)
+        self.NavigationBar = "".join([str(child) for child in body.Children])
+
+    def createDefaultPage(self, versionStamp):
+        doc = lmcore.MarkupNode('html')
+        head = doc.addChild('head')
+        head.addRaw(self.HeadStart)
         meta3 = head.addChild('meta', "", True)
         meta3.setAttribute('id', 'versionstamp')
         meta3.setAttribute('versionstamp', versionStamp)
-        script = head.addChild('script')
-        script.setAttribute('src', '/static/lapmaster.js')
+        head.addRaw(self.HeadEnd)
 
         body = doc.addChild('body')
         body.setAttribute('onload', 'LM.init()')
 
-        self.generateNavigationBar(body)
+        body.addRaw(self.NavigationBar)
 
         return (doc, body)
 
@@ -132,6 +283,7 @@ class HTMLGenerator:
         th8.setData('Varvtid')
 
         tbody = table.addChild('tbody')
+        tbody.setAttribute('id', 'logtail')
         log = self.Report.getLapLog()
         tail = log[-TAIL_SIZE:]
         for timestamp, bib in reversed(tail):
@@ -139,7 +291,7 @@ class HTMLGenerator:
             if not bib in self.Config.Persons:
                 return
 
-            teamId = self.Config.getTeamIdByBib(bib)
+            row = self.getLogTailRow(timestamp, bib)
 
             tr = tbody.addChild('tr')
 
@@ -153,26 +305,42 @@ class HTMLGenerator:
             col7 = tr.addChild('td')
             col8 = tr.addChild('td')
 
-            col1.setData(time_to_string(time.localtime(timestamp)))
-            col2.setData(str(bib))
-            col3.setData(self.getRankText(teamId))
+            col1.setData(row['time'])
+            col2.setData(row['bib'])
+            col3.setData(row['rank'])
             link = col4.addChild('a')
-            link.setAttribute("href", "p" + str(bib) + ".html")
-            personText = self.Config.getPersonNameByBib(bib)
-            if not self.Config.isSolo(bib):
-                personText += " (" + self.Config.getTeamNameByBib(bib) + ")"
-            link.setData(personText)
-            lapInfo = self.Report.getLapInfoByTimestamp(self.Config.getTeamIdByBib(bib), timestamp)
+            link.setAttribute("href", row['href'])
+            link.setData(row['name'])
 
             col5.setAttribute('class', 'number')
-            col5.setData(str(self.Report.getLapCountByTeamId(teamId)))
+            col5.setData(row['laps'])
 
-            if lapInfo:
-                col6.setData(lapInfo.Lag)
-                col7.setData(lapInfo.Lead)
+            col6.setData(row['lag'])
+            col7.setData(row['lead'])
 
-            col8.setData(time_to_string(time.gmtime(lapInfo.LapTime)))
+            col8.setData(row['lapTime'])
 
+    # Returns the cells of a row in the log tail as a dictionary
+    def getLogTailRow(self, timestamp, bib):
+        teamId = self.Config.getTeamIdByBib(bib)
+        personText = self.Config.getPersonNameByBib(bib)
+        if not self.Config.isSolo(bib):
+            personText += " (" + self.Config.getTeamNameByBib(bib) + ")"
+        lapInfo = self.Report.getLapInfoByTimestamp(teamId, timestamp)
+
+        row = {'time': time_to_string(time.localtime(timestamp)),
+               'bib': str(bib),
+               'rank': self.getRankText(teamId),
+               'href': "p" + str(bib) + ".html",
+               'name': personText,
+               'laps': str(self.Report.getLapCountByTeamId(teamId)),
+               'lag': None,
+               'lead': None,
+               'lapTime': time_to_string(time.gmtime(lapInfo.LapTime))}
+        if lapInfo:
+            row['lag'] = lapInfo.Lag
+            row['lead'] = lapInfo.Lead
+        return row
 
     def generateClassStanding(self, classId, root):
         if len(self.Config.getTeamIdsInClass(classId)) == 0:
@@ -198,50 +366,56 @@ class HTMLGenerator:
         tr.addChild('th').setData('Ner')
 
         tbody = table.addChild('tbody')
-
+        tbody.setAttribute('id', 'c' + str(classId))
         rankings = self.Report.getTeamRankings(classId)
-        rank = 1
         for teamId in rankings:
-            lapInfo = self.Report.getLastLapInfo(teamId)
-            if not lapInfo:
+            row = self.getStandingRow(teamId)
+            if not row:
                 break
 
             tr = tbody.addChild('tr')
+            tr.setAttribute('id', 't' + str(teamId))
 
             td = tr.addChild('td')
             td.setAttribute('class', 'number')
-            td.setData(self.getRankText(teamId))
+            td.setData(row['rank'])
 
             td = tr.addChild('td')
             td.setAttribute('class', 'teamname')
             link = td.addChild('a')
-            if self.Config.isSoloTeam(teamId):
-                link.setAttribute("href", "p" + str(teamId) + ".html")
-            else:
-                link.setAttribute("href", "p" + str(teamId) + ".html")
-
-            link.setData(self.Config.getTeamNameByTeamId(teamId))
+            link.setAttribute("href", row['href'])
+            link.setData(row['name'])
 
             td = tr.addChild('td')
             td.setAttribute('class', 'number')
-            td.setData(str(self.Report.getLapCountByTeamId(teamId)))
+            td.setData(row['laps'])
 
             td = tr.addChild('td')
-            td.setData(time_to_string(time.localtime(lapInfo.PassTime)))
+            td.setData(row['time'])
 
             td = tr.addChild('td')
-
-            td.setData(laptime_to_string(lapInfo.LapTime))
-
-            td1 = tr.addChild('td')
-            td2 = tr.addChild('td')
-
-            if lapInfo:
-                td1.setData(lapInfo.Lag)
-                td2.setData(lapInfo.Lead)
-
-            rank += 1
-
+            td.setData(row['lapTime'])
+
+            tr.addChild('td').setData(row['lag'])
+            tr.addChild('td').setData(row['lead'])
+
+    # Returns the cells of a team's row in the class standings as a
+    # dictionary, or None if the team has not completed any lap
+    def getStandingRow(self, teamId):
+        lapInfo = self.Report.getLastLapInfo(teamId)
+        if not lapInfo:
+            return None
+        return {'id': teamId,
+                'rank': self.getRankText(teamId),
+                'href': "p" + str(teamId) + ".html",
+                'name': self.Config.getTeamNameByTeamId(teamId),
+                'laps': str(self.Report.getLapCountByTeamId(teamId)),
+                'time': time_to_string(time.localtime(lapInfo.PassTime)),
+                'lapTime': laptime_to_string(lapInfo.LapTime),
+                'lag': lapInfo.Lag,
+                'lead': lapInfo.Lead}
+
+    @stats.timed('HTMLGenerator.personPage')
     def generatePersonPage(self, bib, versionStamp):
         doc, body = self.createDefaultPage(versionStamp)
 
@@ -353,8 +527,9 @@ class HTMLGenerator:
 
             lap += 1
 
-        self.writeDoc(doc, "p" + str(bib) + ".html")
+        self.writeDoc(doc, "p" + str(bib) + ".html", versionStamp)
 
+    @stats.timed('HTMLGenerator.classMatrixPage')
     def generateClassMatrixPage(self, classId, versionStamp):
         doc, body = self.createDefaultPage(versionStamp)
 
@@ -411,8 +586,9 @@ class HTMLGenerator:
 
             rank += 1
 
-        self.writeDoc(doc, "c" + str(classId) + ".html")
+        self.writeDoc(doc, "c" + str(classId) + ".html", versionStamp)
 
+    @stats.timed('HTMLGenerator.speakerPage')
     def generateSpeakerPage(self, versionStamp):
         doc, body = self.createDefaultPage(versionStamp)
         log = self.Report.getLapLog()
@@ -436,62 +612,147 @@ class HTMLGenerator:
         tr.addChild('th', 'Jagas av')
         tr.addChild('th', 'Ner')
 
-        lastlog = log[-10:]
+        lastlog = log[-SPEAKER_SIZE:]
         tbody = table.addChild('tbody')
         for time, bib in reversed(lastlog):
-            teamId = self.Config.getTeamIdByBib(bib)
-            classId = self.Config.getClassIdByBib(bib)
-            lastLapInfo = self.Report.getLastLapInfo(teamId)
-            ranking = lastLapInfo.Rank
+            row = self.getSpeakerRow(bib)
             tr = tbody.addChild('tr')
-            tr.addChild('td', str(bib))
-            tr.addChild('td', self.Config.getPersonNameByBib(bib))
-            tr.addChild('td', self.Config.getClassNameById(classId))
-            tr.addChild('td', self.Config.getTeamNameByBib(bib))
-            tr.addChild('td', ranking)
-            tr.addChild('td', "(%s)" % (self.Report.getPreviousTeamRanking(teamId)))
-            tr.addChild('td', self.Report.getLapCountByTeamId(teamId))
-            tr.addChild('td', laptime_to_string(self.Report.getLastLapTime(teamId)))
-
-            upTeamName = ""
-            upTeamLag = ""
-            if lastLapInfo.UpTeamId is not None:
-                upTeamName = self.Config.getTeamNameByBib(lastLapInfo.UpTeamId)
-                upTeamLag = lastLapInfo.Lag
-
-            tr.addChild('td', upTeamName)
-            tr.addChild('td', upTeamLag)
-
-            downTeamName = ""
-            downTeamLead = ""
-            if lastLapInfo.DownTeamId is not None:
-                downTeamName = self.Config.getTeamNameByBib(lastLapInfo.DownTeamId)
-                downTeamLead = lastLapInfo.Lead
-
-            tr.addChild('td', downTeamName)
-            tr.addChild('td', downTeamLead)
-        self.writeDoc(doc, "speaker.html")
-
-    def createPages(self, versionStamp):
-        versionStamp = str(versionStamp)
-        doc, body = self.createDefaultPage(versionStamp)
-        flexcontainer = body.addChild('div')
-        flexcontainer.setAttribute('class', 'flexcontainer')
-
-        classIdsInSizeOrder = reversed(self.getClassIdsInSizeOrder())
-        for classId in classIdsInSizeOrder:
-            self.generateClassStanding(classId, flexcontainer)
-            self.generateClassMatrixPage(classId, versionStamp)
+            for key in SPEAKER_COLUMNS:
+                tr.addChild('td', row[key])
+        self.writeDoc(doc, "speaker.html", versionStamp)
 
-        for personId in self.Config.getPersonBibList():
-            self.generatePersonPage(personId, versionStamp)
+    # Returns the cells of a row on the speaker page as a dictionary
+    def getSpeakerRow(self, bib):
+        teamId = self.Config.getTeamIdByBib(bib)
+        classId = self.Config.getClassIdByBib(bib)
+        lastLapInfo = self.Report.getLastLapInfo(teamId)
+
+        upTeamName = ""
+        upTeamLag = ""
+        if lastLapInfo.UpTeamId is not None:
+            upTeamName = self.Config.getTeamNameByBib(lastLapInfo.UpTeamId)
+            upTeamLag = lastLapInfo.Lag
+
+        downTeamName = ""
+        downTeamLead = ""
+        if lastLapInfo.DownTeamId is not None:
+            downTeamName = self.Config.getTeamNameByBib(lastLapInfo.DownTeamId)
+            downTeamLead = lastLapInfo.Lead
+
+        return {'bib': str(bib),
+                'name': self.Config.getPersonNameByBib(bib),
+                'class': self.Config.getClassNameById(classId),
+                'team': self.Config.getTeamNameByBib(bib),
+                'rank': lastLapInfo.Rank,
+                'previousRank': "(%s)" % (self.Report.getPreviousTeamRanking(teamId)),
+                'laps': self.Report.getLapCountByTeamId(teamId),
+                'lapTime': laptime_to_string(self.Report.getLastLapTime(teamId)),
+                'upTeam': upTeamName,
+                'upTeamLag': upTeamLag,
+                'downTeam': downTeamName,
+                'downTeamLead': downTeamLead}
+
+    # Returns (teamIds, classIds) of the teams and classes whose pages are
+    # affected by the laps registered since pages were last created. That is
+    # the teams that registered a lap and the teams just above and below
+    # them, since their lead and lag times may have changed.
+    def getChangedTeams(self):
+        teamIds = set()
+        classIds = set()
+        for timestamp, bib in self.Report.getLapLogFrom(self.RenderedLaps):
+            teamId = self.Config.getTeamIdByBib(bib)
+            teamIds.add(teamId)
+            classIds.add(self.Config.getClassIdByTeamId(teamId))
+            lapInfo = self.Report.getLapInfoByTimestamp(teamId, timestamp)
+            if lapInfo:
+                for otherId in (lapInfo.UpTeamId, lapInfo.DownTeamId):
+                    if otherId is not None:
+                        teamIds.add(otherId)
+        return teamIds, classIds
+
+    # Stops the worker processes
+    def close(self):
+        if self.Pool is not None:
+            self.Pool.shutdown()
+            self.Pool = None
+
+    # Renders pages, as given to render_pages, in the worker processes. The
+    # workers get a checkpoint of the report as it is now. Returns False if
+    # a worker has stopped, after which pages are rendered in this process.
+    def renderPagesInParallel(self, pages, versionStamp):
+        self.Rebuilds += 1
+        checkpoint = self.Report.getCheckpoint()
+        # Several chunks per process evens out pages of different sizes
+        chunkSize = max(1, len(pages) // (self.Processes * 4))
+        chunks = [pages[i:i + chunkSize]
+                  for i in range(0, len(pages), chunkSize)]
+        try:
+            futures = [self.Pool.submit(render_pages, chunk, versionStamp,
+                                        self.Rebuilds, checkpoint)
+                       for chunk in chunks]
+            for future in futures:
+                for page, cachedPage in future.result():
+                    if cachedPage is not None:
+                        self.Cache.add(page, cachedPage)
+                    self.PageStamps[page] = versionStamp
+        except concurrent.futures.process.BrokenProcessPool:
+            Error("A worker process has stopped, pages are created in one "
+                  "process from now on")
+            self.Pool = None
+            return False
+        return True
+
+    # Creates the result pages. Unless full is set, only the pages affected by
+    # laps registered since the last call are written. The index, speaker and
+    # log tail pages are always written. A full rebuild is made the first time
+    # and after the report has been reset.
+    @stats.timed('HTMLGenerator.createPages')
+    def createPages(self, versionStamp, full=False):
+        versionStamp = str(versionStamp)
 
-        self.writeDoc(doc, 'index.html')
+        if self.RenderedLaps is None or \
+                self.RenderedResetCount != self.Report.ResetCount:
+            full = True
+
+        if full:
+            classIds = self.Config.getClassIdList()
+            bibs = self.Config.getPersonBibList()
+        else:
+            teamIds, classIds = self.getChangedTeams()
+            bibs = []
+            for teamId in teamIds:
+                bibs += self.Config.getTeamBibsByTeamId(teamId)
+
+        self.RenderedLaps = self.Report.getLapLogSize()
+        self.RenderedResetCount = self.Report.ResetCount
+
+        classIdsInSizeOrder = list(reversed(self.getClassIdsInSizeOrder()))
+        pages = [('c', classId) for classId in classIdsInSizeOrder
+                 if classId in classIds]
+        pages += [('p', bib) for bib in sorted(bibs)]
+
+        rendered = False
+        if full and self.Pool is not None:
+            rendered = self.renderPagesInParallel(pages, versionStamp)
+        if not rendered:
+            for kind, key in pages:
+                if kind == 'c':
+                    self.generateClassMatrixPage(key, versionStamp)
+                else:
+                    self.generatePersonPage(key, versionStamp)
+
+        with stats.timer('HTMLGenerator.indexPage'):
+            doc, body = self.createDefaultPage(versionStamp)
+            flexcontainer = body.addChild('div')
+            flexcontainer.setAttribute('class', 'flexcontainer')
+            for classId in classIdsInSizeOrder:
+                self.generateClassStanding(classId, flexcontainer)
+            self.writeDoc(doc, 'index.html', versionStamp)
 
         self.generateSpeakerPage(versionStamp)
 
-        taildoc, tailbody = self.createDefaultPage(versionStamp)
-        div = tailbody.addChild('div')
-
-        self.generateLogTail(div)
-        self.writeDoc(taildoc, 'logtail.html')
+        with stats.timer('HTMLGenerator.logTailPage'):
+            taildoc, tailbody = self.createDefaultPage(versionStamp)
+            div = tailbody.addChild('div')
+            self.generateLogTail(div)
+            self.writeDoc(taildoc, 'logtail.html', versionStamp)
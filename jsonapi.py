@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+    jsonapi.py
+
+    Provides the data of the result pages as JSON friendly structures, so
+    that browsers can update pages in place. The standings and team laps can
+    be limited to what has changed since a given version stamp.
+
+    :copyright: (c) 2016 by Robert Johansson.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import array
+import htmlgen
+from lmcore import stats
+
+class JSONGenerator:
+    def __init__(self, config, report, htmlGenerator):
+        self.Config = config
+        self.Report = report
+        # Used to get the same cells as on the result pages
+        self.HTML = htmlGenerator
+        self.reset(0)
+
+    # Forgets all changes. Answers for version stamps before versionStamp
+    # will hold all data.
+    def reset(self, versionStamp):
+        self.FullStamp = versionStamp
+        self.Stamp = versionStamp
+        self.ResetCount = self.Report.ResetCount
+        # Number of laps in the report that have been handled by update
+        self.SeenLaps = 0
+        # Mapping from teamId to its row in the standings, None for teams
+        # without laps
+        self.Rows = {}
+        # Mapping from teamId to the version stamp its row last changed in
+        self.TeamStamps = {}
+        # Mapping from teamId to an array with the version stamp each lap
+        # last changed in
+        self.LapStamps = {}
+        # Mapping from classId to teamIds of ranked teams, best team first
+        self.Orders = {}
+        # Mapping from classId to the version stamp its order last changed in
+        self.ClassStamps = {}
+        for classId in self.Config.getClassIdList():
+            self.Orders[classId] = []
+            self.ClassStamps[classId] = versionStamp
+        # List of (lap index, row) of the latest laps, latest first
+        self.LogTail = []
+        self.Speaker = []
+
+    def _stamp_lap(self, teamId, index, versionStamp):
+        stamps = self.LapStamps.setdefault(teamId, array.array('l'))
+        while len(stamps) <= index:
+            stamps.append(versionStamp)
+        stamps[index] = versionStamp
+
+    # Records what has changed in the report since the last call. Call it
+    # each time pages have been created with the same version stamp.
+    @stats.timed('JSONGenerator.update')
+    def update(self, versionStamp):
+        versionStamp = int(versionStamp)
+        if self.ResetCount != self.Report.ResetCount:
+            self.reset(versionStamp)
+
+        classIds = set()
+        log = self.Report.getLapLogFrom(self.SeenLaps)
+        for timestamp, bib in log:
+            teamId = self.Config.getTeamIdByBib(bib)
+            classIds.add(self.Config.getClassIdByTeamId(teamId))
+            lapInfo = self.Report.getLapInfoByTimestamp(teamId, timestamp)
+            if not lapInfo:
+                continue
+            self._stamp_lap(teamId, lapInfo.Index, versionStamp)
+            # The lead of the team above on the same lap may have been set
+            upTeamId = lapInfo.UpTeamId
+            if upTeamId is not None and \
+                    self.Report.getLapCountByTeamId(upTeamId) > lapInfo.Index:
+                self._stamp_lap(upTeamId, lapInfo.Index, versionStamp)
+        self.SeenLaps += len(log)
+
+        # A lap can change the rank of any team in the class
+        for classId in classIds:
+            order = []
+            for teamId in self.Report.getTeamRankings(classId):
+                row = self.HTML.getStandingRow(teamId)
+                if row:
+                    order.append(teamId)
+                if row != self.Rows.get(teamId):
+                    self.Rows[teamId] = row
+                    self.TeamStamps[teamId] = versionStamp
+            if order != self.Orders[classId]:
+                self.Orders[classId] = order
+                self.ClassStamps[classId] = versionStamp
+
+        if len(log) > 0:
+            self.LogTail = self._get_tail(htmlgen.TAIL_SIZE,
+                                          self.HTML.getLogTailRow)
+            self.Speaker = self._get_tail(
+                htmlgen.SPEAKER_SIZE,
+                lambda timestamp, bib: self.HTML.getSpeakerRow(bib))
+        self.Stamp = versionStamp
+
+    def _get_tail(self, size, getRow):
+        tail = []
+        start = max(0, self.SeenLaps - size)
+        log = self.Report.getLapLogFrom(start)
+        for index in reversed(range(len(log))):
+            timestamp, bib = log[index]
+            if not bib in self.Config.Persons:
+                break
+            tail.append((start + index, getRow(timestamp, bib)))
+        return tail
+
+    # Returns True if an answer for since has to hold all data, i.e. if
+    # since is None or not a version stamp that update has been called with
+    # since the last reset.
+    def isFull(self, since):
+        return since is None or since < self.FullStamp or since > self.Stamp
+
+    def _answer(self, since, data):
+        data['stamp'] = self.Stamp
+        data['full'] = self.isFull(since)
+        return data
+
+    # Returns the standings of all classes. Unless the answer is full, only
+    # the rows of teams that changed after since are given and the order of
+    # the teams only for classes where it changed.
+    def getStandings(self, since=None):
+        full = self.isFull(since)
+        classes = []
+        for classId in reversed(self.HTML.getClassIdsInSizeOrder()):
+            if len(self.Config.getTeamIdsInClass(classId)) == 0:
+                continue
+            order = self.Orders[classId]
+            clazz = {'id': classId,
+                     'name': self.Config.getClassNameById(classId)}
+            if full or self.ClassStamps[classId] > since:
+                clazz['order'] = order
+            clazz['teams'] = [self.Rows[teamId] for teamId in order
+                              if full or self.TeamStamps[teamId] > since]
+            classes.append(clazz)
+        return self._answer(since, {'classes': classes})
+
+    # Returns the rows of the log tail, latest lap first. The answer always
+    # holds all rows, since the rank and lap count shown on older rows are
+    # those of the team now and change with every lap.
+    def getLogTail(self, since=None):
+        return self._answer(since, {'size': htmlgen.TAIL_SIZE,
+                                    'laps': [row for index, row
+                                             in self.LogTail]})
+
+    # Returns the rows of the speaker page, latest lap first. Like the log
+    # tail, the answer always holds all rows.
+    def getSpeaker(self, since=None):
+        return self._answer(since, {'size': htmlgen.SPEAKER_SIZE,
+                                    'laps': [row for index, row
+                                             in self.Speaker]})
+
+    # Returns the laps of a team, or None if there is no such team. Unless the
+    # answer is full, only laps that changed after since are given.
+    def getTeamLaps(self, teamId, since=None):
+        if self.Config.getTeamNameByTeamId(teamId) is None:
+            return None
+        full = self.isFull(since)
+        stamps = self.LapStamps.get(teamId, [])
+        laps = []
+        for lapInfo in self.Report.getLapInfoList(teamId):
+            if not full and lapInfo.Index < len(stamps) and \
+                    stamps[lapInfo.Index] <= since:
+                continue
+            laps.append({'lap': lapInfo.Index + 1,
+                         'bib': lapInfo.Bib,
+                         'passTime': lapInfo.PassTime,
+                         'lapTime': lapInfo.LapTime,
+                         'rank': lapInfo.Rank,
+                         'lag': lapInfo.Lag,
+                         'lead': lapInfo.Lead,
+                         'upTeamId': lapInfo.UpTeamId,
+                         'downTeamId': lapInfo.DownTeamId})
+        return self._answer(since, {'id': teamId, 'laps': laps})
@@ -3,13 +3,18 @@
     :copyright: (c) 2016 by Robert Johansson.
     :license: BSD, see LICENSE for more details.
 """
+from lmcore import stats
 from .configloader import loadConfig
 from .startinfo import StartInfo
 from .log import Log
 from .log import loadLog
 from .log import saveLog
+from .log import appendLog
+from .log import patchLog
 from .clazz import Class
 from .person import Person
 from .team import Team
 from .report import Report
+from .checkpoint import Checkpointer
 from .markup import MarkupNode
+from .markup import MarkupRaw
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+    checkpoint.py
+
+    Feeds log lines to a report and saves checkpoints of the report state on
+    the way. Each checkpoint is tagged with how much of the log it covers and
+    a checksum of that part of the log. When the whole log has to be read
+    again, the report is restored from the latest checkpoint that matches the
+    log, and only the lines after it are replayed. Checkpoints are also tagged
+    with a fingerprint of the configuration, so that a checkpoint made before
+    the configuration was changed is never used.
+
+    :copyright: (c) 2016 by Robert Johansson.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import os
+import json
+import hashlib
+import traceback
+from lmcore import stats
+from .logger import Error, Note
+
+# Number of log lines between checkpoints
+CHECKPOINT_INTERVAL = 200
+# Number of checkpoints to keep
+CHECKPOINT_COUNT = 3
+
+class Checkpointer:
+    def __init__(self, report, path=None, interval=CHECKPOINT_INTERVAL):
+        self.Report = report
+        # File to store checkpoints in, or None to only keep them in memory
+        self.Path = path
+        self.Interval = interval
+        # List of checkpoints, oldest first. Each is a dictionary with the
+        # number of log bytes it covers, the MD5 checksum of those bytes, the
+        # fingerprint of the configuration and the report state.
+        self.Checkpoints = []
+        # The checkpoints as JSON text, so that each checkpoint is only
+        # converted once and not every time the file is written
+        self.Texts = []
+        self.reset()
+        self.load()
+
+    def reset(self):
+        # Number of log bytes fed to the report and their checksum
+        self.Offset = 0
+        self.Digest = hashlib.md5()
+        self.Lines = 0
+
+    # Reads the checkpoints from the file, which has one checkpoint per line
+    def load(self):
+        if self.Path is None or not os.path.isfile(self.Path):
+            return
+        with open(self.Path, 'r') as f:
+            for line in f:
+                try:
+                    checkpoint = json.loads(line)
+                except ValueError:
+                    Error("Could not read a checkpoint from " + self.Path)
+                    continue
+                if isinstance(checkpoint, dict):
+                    self.Checkpoints.append(checkpoint)
+                    self.Texts.append(line.rstrip('\n'))
+        self.Checkpoints = self.Checkpoints[-CHECKPOINT_COUNT:]
+        self.Texts = self.Texts[-CHECKPOINT_COUNT:]
+
+    @stats.timed('Checkpointer.save')
+    def save(self):
+        checkpoint = {'Offset': self.Offset,
+                      'Digest': self.Digest.hexdigest(),
+                      'Config': self.Report.Config.getFingerprint(),
+                      'Report': self.Report.getCheckpoint()}
+        self.Checkpoints.append(checkpoint)
+        self.Checkpoints = self.Checkpoints[-CHECKPOINT_COUNT:]
+        if self.Path is None:
+            return
+        self.Texts.append(json.dumps(checkpoint))
+        self.Texts = self.Texts[-CHECKPOINT_COUNT:]
+        tmpPath = self.Path + '.tmp'
+        with open(tmpPath, 'w') as f:
+            f.write('\n'.join(self.Texts) + '\n')
+        os.rename(tmpPath, self.Path)
+
+    # Updates the report with one or more complete log lines. A checkpoint is
+    # saved every interval lines, unless save is False. A line that cannot be
+    # applied, e.g. a bib that is not in the configuration, is logged and
+    # skipped, so that the lines after it are still applied and the offset
+    # and checksum still match the log.
+    def update(self, text, save=True):
+        for line in text.splitlines():
+            if len(line) == 0:
+                continue
+            data = (line + '\n').encode('utf-8')
+            try:
+                self.Report.update(line)
+            except Exception:
+                Error("Could not apply log line %s:\n%s" %
+                      (line, traceback.format_exc()))
+            self.Offset += len(data)
+            self.Digest.update(data)
+            self.Lines += 1
+            if save and self.Lines % self.Interval == 0:
+                self.save()
+
+    # Returns the latest checkpoint that covers a part of data, which must
+    # be the whole log, with matching checksum and that was made with the
+    # current configuration. Returns None if there is none.
+    def find(self, data):
+        fingerprint = self.Report.Config.getFingerprint()
+        for checkpoint in reversed(self.Checkpoints):
+            if checkpoint.get('Config') != fingerprint:
+                continue
+            offset = checkpoint['Offset']
+            if offset > len(data):
+                continue
+            if hashlib.md5(data[:offset]).hexdigest() == checkpoint['Digest']:
+                return checkpoint
+        return None
+
+    # Rebuilds the report from the text of the whole log. Only the lines
+    # after the latest matching checkpoint are replayed, unless
+    # useCheckpoints is False.
+    def resync(self, text, useCheckpoints=True):
+        lines = [line for line in text.splitlines() if len(line) > 0]
+        data = ''.join([line + '\n' for line in lines]).encode('utf-8')
+
+        self.reset()
+        checkpoint = None
+        if useCheckpoints:
+            checkpoint = self.find(data)
+        if checkpoint and self.Report.loadCheckpoint(checkpoint['Report']):
+            self.Offset = checkpoint['Offset']
+            self.Digest.update(data[:self.Offset])
+            self.Lines = data.count(b'\n', 0, self.Offset)
+            Note("Restored report from checkpoint at line %d" % (self.Lines))
+        else:
+            self.Report.reset()
+
+        # Only one checkpoint is saved, at the end, as saving one every
+        # interval lines would make replaying a long log take quadratic time
+        replayed = self.Lines
+        self.update(data[self.Offset:].decode('utf-8'), False)
+        if self.Lines - replayed >= self.Interval:
+            self.save()
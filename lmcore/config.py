@@ -8,39 +8,84 @@
     :license: BSD, see LICENSE for more details.
 """
 
+import json
+import hashlib
+from lmcore import stats
+
 class Config:
     def __init__(self, classes, persons, teams):
         self.Classes = classes
         self.Persons = persons
         self.Teams = teams
+        self.buildIndex()
+
+    # Builds lookup tables from the class, person and team dictionaries so
+    # that the accessors below do not need to scan all teams. Must be called
+    # again if Classes, Persons or Teams are modified after construction.
+    def buildIndex(self):
+        # Mapping from bib to Team
+        self.TeamByBib = {}
+        # Mapping from teamId to Team
+        self.TeamById = {}
+        # Mapping from classId to list of teamIds
+        self.TeamIdsByClass = {}
+        for classId in self.Classes.keys():
+            self.TeamIdsByClass[classId] = []
+
+        for k, team in self.Teams.items():
+            if not team.Id in self.TeamById:
+                self.TeamById[team.Id] = team
+            for bib in team.BibList:
+                if not bib in self.TeamByBib:
+                    self.TeamByBib[bib] = team
+            if not team.ClassId in self.TeamIdsByClass:
+                self.TeamIdsByClass[team.ClassId] = []
+            self.TeamIdsByClass[team.ClassId].append(team.Id)
+
+        self.PersonBibList = sorted([p.Number for p in self.Persons.values()])
+        self.Fingerprint = None
+
+    # Returns a checksum of everything in the configuration that affects the
+    # state of a report: the classes, the class of each team and the bibs in
+    # each team. Names are left out.
+    def getFingerprint(self):
+        if self.Fingerprint is None:
+            classes = sorted([[c.Id, c.MaxPersons]
+                              for c in self.Classes.values()])
+            teams = sorted([[t.Id, t.ClassId, sorted(t.BibList)]
+                            for t in self.Teams.values()])
+            data = json.dumps([classes, teams]).encode('utf-8')
+            self.Fingerprint = hashlib.md5(data).hexdigest()
+        return self.Fingerprint
 
     def getClassIdList(self):
         return list(self.Classes.keys())
 
+    @stats.timed('Config.getClassNameById')
     def getClassNameById(self, classId):
         return self.Classes[classId].Name
 
+    @stats.timed('Config.getClassIdByBib')
     def getClassIdByBib(self, bib):
-        teamId = self.getTeamIdByBib(bib)
-        return self.Teams[teamId].ClassId
+        return self.TeamByBib[bib].ClassId
 
+    @stats.timed('Config.getClassIdByTeamId')
     def getClassIdByTeamId(self, teamId):
         return self.Teams[teamId].ClassId
 
     def getPersonBibList(self):
-        bibList = []
-        for k, person in self.Persons.items():
-            bibList.append(person.Number)
-        bibList.sort()
-        return bibList
+        return list(self.PersonBibList)
 
+    @stats.timed('Config.getPersonNameByBib')
     def getPersonNameByBib(self, bib):
         return self.Persons[bib].Name
 
+    @stats.timed('Config.isSolo')
     def isSolo(self, bib):
         classId = self.getClassIdByBib(bib)
         return self.Classes[classId].isSolo()
 
+    @stats.timed('Config.isSoloTeam')
     def isSoloTeam(self, teamId):
         classId = self.getClassIdByTeamId(teamId)
         return self.Classes[classId].isSolo()
@@ -48,45 +93,44 @@ class Config:
     def getTeamIdList(self):
         return list(self.Teams.keys())
 
+    @stats.timed('Config.getTeamIdByBib')
     def getTeamIdByBib(self, bib):
-        for k, team in self.Teams.items():
-            if team.isMember(bib):
-                return team.Id
+        team = self.TeamByBib.get(bib)
+        if team is None:
+            return None
+        return team.Id
 
+    @stats.timed('Config.getTeamNameByBib')
     def getTeamNameByBib(self, bib):
-        for k, team in self.Teams.items():
-            if bib in team.getBibList():
-                return team.Name
-        return None
+        team = self.TeamByBib.get(bib)
+        if team is None:
+            return None
+        return team.Name
 
+    @stats.timed('Config.getTeamNameByTeamId')
     def getTeamNameByTeamId(self, id):
-        for k, team in self.Teams.items():
-            if team.Id == id:
-                return team.Name
-        return None
+        team = self.TeamById.get(id)
+        if team is None:
+            return None
+        return team.Name
 
+    @stats.timed('Config.getTeamIdsInClass')
     def getTeamIdsInClass(self, classId):
-        result = []
-        for k, team in self.Teams.items():
-            if team.ClassId == classId:
-                result.append(team.Id)
-        return result
+        return list(self.TeamIdsByClass.get(classId, []))
 
+    @stats.timed('Config.getTeamBibsByBib')
     def getTeamBibsByBib(self, bib):
-        result = []
-        for k, team in self.Teams.items():
-            if bib in team.getBibList():
-                result = team.getBibList()
-                break
-        return result
+        team = self.TeamByBib.get(bib)
+        if team is None:
+            return []
+        return team.getBibList()
 
+    @stats.timed('Config.getTeamBibsByTeamId')
     def getTeamBibsByTeamId(self, teamId):
-        result = []
-        for k, team in self.Teams.items():
-            if teamId == team.Id:
-                result = team.getBibList()
-                break
-        return result
+        team = self.TeamById.get(teamId)
+        if team is None:
+            return []
+        return team.getBibList()
 
     def getPerson(self):
         pass
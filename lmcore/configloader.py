@@ -26,6 +26,12 @@ class ConfigLoader:
         self.Persons = {}
         self.Teams = {}
 
+        # Lookup tables kept up to date while loading so that each row can
+        # be validated without scanning what has already been loaded
+        self.ClassNames = set()
+        self.TeamNames = set()
+        self.TeamByBib = {}
+
         self.File = ""
         self.Row = 0
 
@@ -41,18 +47,16 @@ class ConfigLoader:
     def isValidTeam(self, classId, name, bibList):
         # Check for valid class
         if not classId in self.Classes:
-            self.error(self.TeamConfig, self.TeamConfig,
-                       "No class with id " + str(classid) + " is defined.")
+            self.error("No class with id " + str(classId) + " is defined.")
             return False
 
         # Check for unique team name
-        for k, team in self.Teams.items():
-            if name == team.Name:
-                self.error("There is already a team called " + name)
-                return False
+        if name in self.TeamNames:
+            self.error("There is already a team called " + name)
+            return False
 
         # Check for member list consistency
-        members = []
+        members = set()
         for bibText in bibList:
             bib = int(bibText)
 
@@ -61,23 +65,26 @@ class ConfigLoader:
                            + str(bib))
                 return False
 
-            for b in members:
-                if bib == b:
-                    self.error("Person with number " + str(bib) \
-                                   + " is already in team.")
-                    return False
+            if bib in members:
+                self.error("Person with number " + str(bib) \
+                               + " is already in team.")
+                return False
 
-            for teamId, team in self.Teams.items():
-                for b in team.BibList:
-                    if bib == b:
-                        self.error("Person with number "
-                                   + str(bib) + " is already in "
-                                   "another team.")
-                        return False
-            members.append(bib)
+            if bib in self.TeamByBib:
+                self.error("Person with number "
+                           + str(bib) + " is already in "
+                           "another team.")
+                return False
+            members.add(bib)
 
         return True
 
+    def addTeam(self, team):
+        self.Teams[team.Id] = team
+        self.TeamNames.add(team.Name)
+        for bib in team.BibList:
+            self.TeamByBib[bib] = team.Id
+
     def showClassFormat(self):
         Print("Class definition format should be:"\
               " <class id>,<max team size>,<class name>")
@@ -109,12 +116,12 @@ class ConfigLoader:
                 self.error("There is already a class with number " \
                                + str(classid))
                 return False
-            for n, c in list(self.Classes.items()):
-                if c.Name == name:
-                    self.error("There is already a class with name " \
-                                   + name)
-                    return False
+            if name in self.ClassNames:
+                self.error("There is already a class with name " \
+                               + name)
+                return False
             self.Classes[classid] = Class(classid, maxpersons, name)
+            self.ClassNames.add(name)
         return self.Classes
 
     def loadPersons(self):
@@ -150,9 +157,7 @@ class ConfigLoader:
                     self.Persons[bib] = Person(bib, name)
 
                 if self.isValidTeam(classId, name, [bib]):
-                    team = Team(classId, name, [bib])
-                    teamId = team.Id
-                    self.Teams[teamId] = team
+                    self.addTeam(Team(classId, name, [bib]))
             else:
                 if len(tokens) != 2:
                     self.error("Team person format: <bib>,<name>")
@@ -188,9 +193,8 @@ class ConfigLoader:
                 return False
 
             if self.isValidTeam(classId, name, tokens[2:]):
-                team = Team(classId, name, [int(bib) for bib in tokens[2:]])
-                teamId = team.Id
-                self.Teams[teamId] = team
+                self.addTeam(Team(classId, name,
+                                  [int(bib) for bib in tokens[2:]]))
 
         return self.Teams
 
@@ -209,13 +213,11 @@ class ConfigLoader:
 def check(classes, persons, teams):
     # See if there is a person which is not in a team
     status = True
+    members = set()
+    for teamId, t in teams.items():
+        members.update(t.BibList)
     for personId, p in persons.items():
-        member = False
-        for teamId, t in teams.items():
-            if t.isMember(p.Number):
-                member = True
-                break
-        if not member:
+        if not p.Number in members:
             Error("Person " + str(p.Number) + " " \
                       + str(p.Name) + " is not in any team")
             status = False
@@ -9,8 +9,12 @@
 """
 
 import os
+import re
 import time
+import mmap
+import struct
 from . import startinfo
+from lmcore import stats
 try:
     import lockfile
 except:
@@ -25,9 +29,24 @@ from .logger import Error, Note
 
 ADDRESS = "localhost"
 PORT = 8008
+SYNC_MESSAGE = "sync"
 message_count = 0
 sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 
+# The index of a log file is stored next to it in a file with this suffix
+INDEX_SUFFIX = ".idx"
+INDEX_MAGIC = b"LMIX"
+INDEX_VERSION = 1
+# Magic, version, size and modification time in nanoseconds of the log file
+# when the index was made, number of records and number of texts
+INDEX_HEADER = struct.Struct("<4sHqqII")
+# Timestamp, kind and value of an event
+INDEX_RECORD = struct.Struct("<dBq")
+# Kinds of events in the index. The value of a bib event is the bib, the
+# value of a text event is the position of its text in the index.
+KIND_BIB = 0
+KIND_TEXT = 1
+
 def isStart(event):
     return event[0:5] == 'start'
 
@@ -53,12 +72,103 @@ class ExclusiveLockFile():
         self.File.close()
         self.Lock.release()
 
-def loadLog(path, config):
+# Writes an index of the events of a log file. stat is os.stat of the log
+# file from which the events were read.
+def writeIndex(path, events, stat):
+    texts = []
+    textIndexes = {}
+    records = []
+    for timestamp, event in events:
+        # Only plain ASCII numbers that read back the same, e.g. not 012,
+        # and that fit in the record
+        if re.fullmatch('[0-9]{1,18}', event) and str(int(event)) == event:
+            records.append(INDEX_RECORD.pack(timestamp, KIND_BIB, int(event)))
+        else:
+            if not event in textIndexes:
+                textIndexes[event] = len(texts)
+                texts.append(event)
+            records.append(INDEX_RECORD.pack(timestamp, KIND_TEXT,
+                                             textIndexes[event]))
+
+    tmpPath = path + ".tmp"
+    with open(tmpPath, 'wb') as f:
+        f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, stat.st_size,
+                                  stat.st_mtime_ns, len(records), len(texts)))
+        f.write(b"".join(records))
+        for text in texts:
+            data = text.encode('utf-8')
+            f.write(struct.pack("<I", len(data)))
+            f.write(data)
+    os.replace(tmpPath, path)
+
+# Returns the events in the index of a log file, or None if there is no
+# index or if it does not match stat, os.stat of the log file.
+def readIndex(path, stat):
+    if not os.path.isfile(path) or os.path.getsize(path) < INDEX_HEADER.size:
+        return None
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            magic, version, size, mtime, recordCount, textCount = \
+                INDEX_HEADER.unpack_from(m)
+            if magic != INDEX_MAGIC or version != INDEX_VERSION or \
+                    size != stat.st_size or mtime != stat.st_mtime_ns:
+                return None
+
+            start = INDEX_HEADER.size
+            end = start + recordCount * INDEX_RECORD.size
+            texts = []
+            offset = end
+            for i in range(textCount):
+                length, = struct.unpack_from("<I", m, offset)
+                offset += 4
+                texts.append(m[offset:offset + length].decode('utf-8'))
+                offset += length
+
+            events = []
+            bibTexts = {}
+            for timestamp, kind, value in INDEX_RECORD.iter_unpack(m[start:end]):
+                if kind == KIND_BIB:
+                    event = bibTexts.get(value)
+                    if event is None:
+                        event = str(value)
+                        bibTexts[value] = event
+                else:
+                    event = texts[value]
+                events.append((timestamp, event))
+            return events
+
+# Loads a log file. If useIndex is set, the events are read from an index
+# next to the log file when it is up to date. Otherwise the index is made
+# from the log file, so that it can be used next time.
+@stats.timed('loadLog')
+def loadLog(path, config, useIndex=False):
     startInfo = startinfo.StartInfo(config)
     events = []
     row = 0
     if os.path.isfile(path):
         with ExclusiveLockFile(path, 'r') as f:
+            stat = os.fstat(f.fileno())
+            indexPath = path + INDEX_SUFFIX
+            if useIndex:
+                try:
+                    indexEvents = readIndex(indexPath, stat)
+                except (OSError, ValueError, struct.error):
+                    indexEvents = None
+                if indexEvents is not None:
+                    # The index is only written for valid logs, so starts
+                    # only have to be registered. A start is still invalid
+                    # if the classes have changed since, and then the log is
+                    # read as if there were no index to report where.
+                    valid = True
+                    for timestamp, event in indexEvents:
+                        if isStart(event) and not startInfo.startClasses(
+                                event.rsplit(" ")[1:], timestamp):
+                            valid = False
+                            break
+                    if valid:
+                        return Log(indexEvents), startInfo
+                    startInfo.reset()
+
             while True:
                 line = f.readline()
                 row += 1
@@ -85,18 +195,78 @@ def loadLog(path, config):
                 # Everything seems ok, add this entry to the log
                 events.append((timestamp, tokens[1]))
 
+            if useIndex:
+                try:
+                    writeIndex(indexPath, events, stat)
+                except (OSError, ValueError, struct.error):
+                    Note("Could not write index " + indexPath)
+
     else:
         Note("Could not load log file " + path + ". Log is empty.")
 
     return Log(events), startInfo
 
-def saveLog(log, path):
+def formatEvent(event):
+    return str(event[0]) + "," + str(event[1]) + "\n"
+
+# Notifies the log monitor that the log file has changed. If lines that were
+# already in the file have been changed, sync should be set so that the log
+# monitor checks the whole file and not only the appended lines.
+def notify(sync=False):
     global message_count
+    text = str(message_count)
+    if sync:
+        text += " " + SYNC_MESSAGE
+    sock.sendto(text.encode('ascii'), (ADDRESS, PORT))
+    message_count += 1
+
+# Rewrites the whole log file. Use appendLog or patchLog for changes during a
+# race, this is only needed to compact or normalise a log file.
+@stats.timed('saveLog')
+def saveLog(log, path):
     with ExclusiveLockFile(path, 'w') as f:
         for e in log.Events:
-            f.write(str(e[0]) + "," + str(e[1]) + "\n")
-    sock.sendto(str(message_count), (ADDRESS, PORT))
-    message_count += 1
+            f.write(formatEvent(e))
+    notify(True)
+
+# Appends the last count events of the log to the log file. The cost does not
+# depend on the size of the log.
+@stats.timed('appendLog')
+def appendLog(log, path, count=1):
+    with ExclusiveLockFile(path, 'a+b') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() > 0:
+            f.seek(-1, os.SEEK_END)
+            last = f.read(1)
+            f.seek(0, os.SEEK_END)
+            if last != b'\n':
+                f.write(b'\n')
+        for e in log.Events[len(log.Events) - count:]:
+            f.write(formatEvent(e).encode('utf-8'))
+    notify()
+
+# Writes a change of the event at index to the log file. Lines before index
+# are left untouched, the rest of the file is rewritten. Changes are usually
+# made close to the end of the log, which keeps the cost low.
+def patchLog(log, path, index):
+    with ExclusiveLockFile(path, 'r+b') as f:
+        row = 0
+        while row < index:
+            if len(f.readline()) == 0:
+                break
+            row += 1
+
+        if row < index:
+            Note("Log file " + path + " is shorter than the log. " \
+                 "Rewriting all of it.")
+            row = 0
+            f.seek(0)
+
+        f.seek(f.tell())
+        f.truncate()
+        for e in log.Events[row:]:
+            f.write(formatEvent(e).encode('utf-8'))
+    notify(True)
 
 class Log:
     def __init__(self, events):
@@ -9,6 +9,9 @@
     :copyright: (c) 2016 by Robert Johansson.
     :license: BSD, see LICENSE for more details.
 """
+
+from lmcore import stats
+
 class MarkupNode:
     def __init__(self, tag, data=None, short=False):
         self.Tag = tag
@@ -28,24 +31,55 @@ class MarkupNode:
         self.Children.append(child)
         return child
 
-    def __str__(self):
-        result = "<" + self.Tag
+    # Adds a child holding already generated markup, e.g. from str() of
+    # another node, which is output as it is.
+    def addRaw(self, text):
+        child = MarkupRaw(text)
+        self.Children.append(child)
+        return child
+
+    # Appends the markup of the node and its children to the list out, one
+    # chunk at a time.
+    def render(self, out):
+        out.append("<" + self.Tag)
 
-        if len(self.Attributes) > 0:
-            for key, value in self.Attributes.items():
-                result += " " + key + "=" + "\"" + value + "\""
+        for key, value in self.Attributes.items():
+            out.append(" " + key + "=" + "\"" + value + "\"")
 
         if self.Short:
-            result += "/>"
-            return result
+            out.append("/>")
+            return
         else:
-            result += ">"
+            out.append(">")
 
         if len(self.Children) > 0:
             for child in self.Children:
-                result += str(child)
+                child.render(out)
         elif self.Data:
-            result += str(self.Data)
+            out.append(str(self.Data))
+
+        out.append("</" + self.Tag + ">\n")
 
-        result += "</" + self.Tag + ">\n"
-        return result
+    # Writes the markup to a file-like object without first joining it into
+    # a single string.
+    @stats.timed('MarkupNode.write')
+    def write(self, f):
+        out = []
+        self.render(out)
+        f.writelines(out)
+
+    @stats.timed('MarkupNode.__str__')
+    def __str__(self):
+        out = []
+        self.render(out)
+        return "".join(out)
+
+class MarkupRaw:
+    def __init__(self, text):
+        self.Text = text
+
+    def render(self, out):
+        out.append(self.Text)
+
+    def __str__(self):
+        return self.Text
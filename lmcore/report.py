@@ -10,7 +10,12 @@
     :license: BSD, see LICENSE for more details.
 """
 
+import array
+import base64
+import binascii
+import bisect
 import lmcore
+from lmcore import stats
 from logger import Error, Note
 
 # For transition for Python2
@@ -34,29 +39,127 @@ def cmp_to_key(mycmp):
     return K
 
 
-class LapInfo:
-    def __init__(self):
-        # The time at which the lap was registered
-        self.PassTime = None
-        # The number of the person that completed tha lap
-        self.Bib = None
-        # The lap time
-        self.LapTime = None
-        # The rank of the team when this lap was completed
-        self.Rank = None
-        # Lead time to next team in class. Unknown until the next team has
-        # completed the same lap.
-        # Is either a number of seconds, e.g. "73", or number of laps,
-        # eg "4 laps"
-        self.Lead = None
-        # Id of next/worse/down team in class
-        self.DownTeamId = None
-        # Lag time behind the previous team in class. Not set for leaders.
-        # Is either a number of seconds, e.g. "73", or number of laps,
-        # eg "4 laps"
-        self.Lag = None
-        # Id of previous/better/up team in class
-        self.UpTeamId = None
+# Kinds of lead and lag values
+# Not known yet
+GAP_NONE = 0
+# The team is the only ranked team in its class
+GAP_EMPTY = 1
+# Number of whole seconds to the other team on the same lap, e.g. "-01:13"
+GAP_TIME = 2
+# Number of laps to the other team, e.g. "-4v"
+GAP_LAPS = 3
+# Number of whole seconds the team was ahead of the next team on the
+# previous lap, e.g. "(-01:13)"
+GAP_PREVIOUS_TIME = 4
+# The team has passed the next team since the previous lap
+GAP_PASSING = 5
+
+# Stored instead of a team id when there is no team up or down
+NO_TEAM = -1
+
+# Texts of lead and lag values that have been formatted so far. There are
+# only as many different values as there are seconds and laps in a race.
+GAP_TEXTS = {}
+
+# Returns the text for a lead or lag value. sign is "-" for leads and "+"
+# for lags.
+def gap_to_string(kind, value, sign):
+    key = (kind, value, sign)
+    try:
+        return GAP_TEXTS[key]
+    except KeyError:
+        pass
+
+    if kind == GAP_NONE:
+        text = None
+    elif kind == GAP_EMPTY:
+        text = ""
+    elif kind == GAP_TIME:
+        text = sign + time_to_string(value)
+    elif kind == GAP_LAPS:
+        text = sign + str(value) + "v"
+    elif kind == GAP_PREVIOUS_TIME:
+        text = "(" + sign + time_to_string(value) + ")"
+    else:
+        text = "Plockar!"
+    GAP_TEXTS[key] = text
+    return text
+
+# Returns the bytes of an array as base64 encoded text
+def encode_array(values):
+    return base64.b64encode(values.tobytes()).decode('ascii')
+
+# Returns an array of type typecode from text returned by encode_array.
+# Raises ValueError if text is not such text.
+def decode_array(typecode, text):
+    values = array.array(typecode)
+    try:
+        values.frombytes(base64.b64decode(text.encode('ascii')))
+    except (binascii.Error, AttributeError):
+        raise ValueError("Invalid array")
+    return values
+
+# A view of one lap of a team. The lap data is kept in the arrays of the
+# TeamInfo.
+class LapInfo(object):
+    __slots__ = ('Team', 'Index')
+
+    def __init__(self, teamInfo, index):
+        self.Team = teamInfo
+        self.Index = index
+
+    # The time at which the lap was registered
+    @property
+    def PassTime(self):
+        return self.Team.PassTimes[self.Index]
+
+    # The number of the person that completed tha lap
+    @property
+    def Bib(self):
+        return self.Team.Bibs[self.Index]
+
+    # The lap time
+    @property
+    def LapTime(self):
+        return self.Team.LapTimes[self.Index]
+
+    # The rank of the team when this lap was completed
+    @property
+    def Rank(self):
+        return self.Team.Ranks[self.Index]
+
+    # Lead time to next team in class. Unknown until the next team has
+    # completed the same lap.
+    # Is either a number of seconds, e.g. "-01:13", or number of laps,
+    # eg "-4v"
+    @property
+    def Lead(self):
+        return gap_to_string(self.Team.LeadKinds[self.Index],
+                             self.Team.Leads[self.Index], "-")
+
+    # Id of next/worse/down team in class
+    @property
+    def DownTeamId(self):
+        teamId = self.Team.DownTeamIds[self.Index]
+        if teamId == NO_TEAM:
+            return None
+        return teamId
+
+    # Lag time behind the previous team in class. Not set for leaders.
+    # Is either a number of seconds, e.g. "+01:13", or number of laps,
+    # eg "+4v"
+    @property
+    def Lag(self):
+        return gap_to_string(self.Team.LagKinds[self.Index],
+                             self.Team.Lags[self.Index], "+")
+
+    # Id of previous/better/up team in class
+    @property
+    def UpTeamId(self):
+        teamId = self.Team.UpTeamIds[self.Index]
+        if teamId == NO_TEAM:
+            return None
+        return teamId
 
     def __str__(self):
         return '{"PassTime":%.2f, "Bib":%d, "LapTime":%.2f, "Rank":%d, ' \
@@ -66,24 +169,107 @@ class LapInfo:
     def __repr__(self):
         return str(self)
 
+# A read only sequence of LapInfo for the laps of a team
+class LapList(object):
+    __slots__ = ('Team',)
+
+    def __init__(self, teamInfo):
+        self.Team = teamInfo
+
+    def __len__(self):
+        return len(self.Team.PassTimes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [LapInfo(self.Team, i)
+                    for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError("lap index out of range")
+        return LapInfo(self.Team, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield LapInfo(self.Team, index)
+
+    def __str__(self):
+        return str(list(self))
+
+    def __repr__(self):
+        return str(self)
+
 class TeamInfo:
+    # Names and array type codes of the lap columns
+    COLUMNS = (('PassTimes', 'd'), ('Bibs', 'l'), ('LapTimes', 'd'),
+               ('Ranks', 'l'), ('LeadKinds', 'b'), ('Leads', 'l'),
+               ('DownTeamIds', 'l'), ('LagKinds', 'b'), ('Lags', 'l'),
+               ('UpTeamIds', 'l'))
+
     def __init__(self, teamId):
         self.Id = teamId
-        # List of LapInfo
-        self.Laps = []
+        # The laps are stored column by column, one array per LapInfo
+        # attribute. Lead and Lag are stored as a kind and a value.
+        for name, typecode in TeamInfo.COLUMNS:
+            setattr(self, name, array.array(typecode))
+        # Sequence of LapInfo
+        self.Laps = LapList(self)
         # Current rank
         self.Rank = None
+        # Position in which the team was added to its class. Used to break
+        # ties when ranking.
+        self.Order = 0
 
     def add_lap(self, startTime, timestamp, bib):
-        lapInfo = LapInfo()
-        lapInfo.PassTime = timestamp
-        lapInfo.Bib = bib
-        if len(self.Laps) == 0:
-            lapInfo.LapTime = timestamp - startTime
+        if len(self.PassTimes) == 0:
+            lapTime = timestamp - startTime
         else:
-            lapInfo.LapTime = timestamp - self.get_latest_pass_time()
-        self.Laps.append(lapInfo)
-        return self.Laps[-1]
+            lapTime = timestamp - self.PassTimes[-1]
+        self.PassTimes.append(timestamp)
+        self.Bibs.append(bib)
+        self.LapTimes.append(lapTime)
+        self.Ranks.append(0)
+        self.LeadKinds.append(GAP_NONE)
+        self.Leads.append(0)
+        self.DownTeamIds.append(NO_TEAM)
+        self.LagKinds.append(GAP_NONE)
+        self.Lags.append(0)
+        self.UpTeamIds.append(NO_TEAM)
+        return LapInfo(self, len(self.PassTimes) - 1)
+
+    # Gaps are only shown with a precision of seconds, so value is stored
+    # as a whole number
+    def set_lead(self, index, kind, value=0):
+        self.LeadKinds[index] = kind
+        self.Leads[index] = int(value)
+
+    def set_lag(self, index, kind, value=0):
+        self.LagKinds[index] = kind
+        self.Lags[index] = int(value)
+
+    def get_lap_count(self):
+        return len(self.PassTimes)
+
+    # Returns the laps as a mapping from column name to the base64 encoded
+    # bytes of that column, which is much smaller and faster to store as
+    # JSON than a list of numbers
+    def get_columns(self):
+        columns = {}
+        for name, typecode in TeamInfo.COLUMNS:
+            columns[name] = encode_array(getattr(self, name))
+        return columns
+
+    # Replaces the laps with laps from columns returned by get_columns
+    def set_columns(self, columns):
+        arrays = {}
+        for name, typecode in TeamInfo.COLUMNS:
+            arrays[name] = decode_array(typecode, columns[name])
+        count = len(arrays['PassTimes'])
+        for name, typecode in TeamInfo.COLUMNS:
+            if len(arrays[name]) != count:
+                raise ValueError("Column %s has the wrong length" % name)
+        for name, typecode in TeamInfo.COLUMNS:
+            setattr(self, name, arrays[name])
 
     def get_rank(self):
         if len(self.Laps) > 0:
@@ -91,8 +277,8 @@ class TeamInfo:
         return 0
 
     def get_latest_pass_time(self):
-        if len(self.Laps) > 0:
-            return self.Laps[-1].PassTime
+        if len(self.PassTimes) > 0:
+            return self.PassTimes[-1]
         return 0
 
     def __str__(self):
@@ -108,15 +294,71 @@ class ClassInfo:
     def __init__(self, classId):
         self.Id = classId
         self.Teams = {}
+        # Ordered list of teamIds, best team first. Empty until the first
+        # lap in the class has been registered.
+        self.RankList = []
+        # All teams in rank order and their sort keys, kept in parallel.
+        # A key is (-lap count, latest pass time, order of addition), which
+        # orders teams the same way as a stable sort with compareTeams.
+        self.TeamOrder = []
+        self.Keys = []
+
+    def _get_key(self, teamInfo, order):
+        return (-teamInfo.get_lap_count(), teamInfo.get_latest_pass_time(),
+                order)
+
+    def add_team(self, teamInfo):
+        order = len(self.Teams)
+        self.Teams[teamInfo.Id] = teamInfo
+        teamInfo.Order = order
+        key = self._get_key(teamInfo, order)
+        index = bisect.bisect_right(self.Keys, key)
+        self.Keys.insert(index, key)
+        self.TeamOrder.insert(index, teamInfo.Id)
+
+    # Moves a team to its new position after it has registered a lap and
+    # updates the rank of the teams it passed. oldKey is the key the team
+    # had before the lap was added.
+    def update_rank(self, teamInfo, oldKey):
+        oldIndex = bisect.bisect_left(self.Keys, oldKey)
+        newKey = self._get_key(teamInfo, teamInfo.Order)
+        # A new lap always improves the key, so the team can only move up
+        newIndex = bisect.bisect_left(self.Keys, newKey, 0, oldIndex)
+
+        self.Keys[newIndex + 1:oldIndex + 1] = self.Keys[newIndex:oldIndex]
+        self.Keys[newIndex] = newKey
+        self.TeamOrder[newIndex + 1:oldIndex + 1] = \
+            self.TeamOrder[newIndex:oldIndex]
+        self.TeamOrder[newIndex] = teamInfo.Id
+
+        # Teams that were passed lose one position
+        for index in range(newIndex + 1, oldIndex + 1):
+            t = self.Teams[self.TeamOrder[index]]
+            if t.get_lap_count() > 0:
+                t.Rank = index + 1
+        teamInfo.Rank = newIndex + 1
+
+        self.RankList = self.TeamOrder
+
+    # Sorts all teams again, e.g. after their laps have been replaced
+    def restore_rank(self):
+        keyed = sorted([(self._get_key(t, t.Order), t.Id)
+                        for t in self.Teams.values()])
+        self.Keys = [key for key, teamId in keyed]
+        self.TeamOrder = [teamId for key, teamId in keyed]
         self.RankList = []
+        for teamInfo in self.Teams.values():
+            if teamInfo.get_lap_count() > 0:
+                self.RankList = self.TeamOrder
+                break
 
 # Takes two TeamInfo
 # Returns 1, 0 or -1 depending on if team1 is better, same or worse than
 # team2.
 def compareTeams(team1, team2):
-    if len(team1.Laps) > len(team2.Laps):
+    if team1.get_lap_count() > team2.get_lap_count():
         return -1
-    elif len(team1.Laps) < len(team2.Laps):
+    elif team1.get_lap_count() < team2.get_lap_count():
         return 1
     else:
         if team1.get_latest_pass_time() < team2.get_latest_pass_time():
@@ -140,6 +382,12 @@ class Report:
         self.StartInfo = lmcore.StartInfo(config)
         # Mapping from classId to ClassInfo
         self.Classes = {}
+        # Number of times the report has been reset
+        self.ResetCount = 0
+        # Mapping from bib to number of laps of that person
+        self.LapCounts = {}
+        # Mapping from (teamId, timestamp) to index of the team's lap
+        self.LapIndexes = {}
         self.reset()
 
     def _get_team_info(self, teamId):
@@ -150,8 +398,18 @@ class Report:
         classId = self.Config.getClassIdByTeamId(teamId)
         return self.Classes[classId].Teams[teamId].Laps
 
+    # Adds the laps of a team to LapCounts and LapIndexes
+    def _index_laps(self, teamInfo):
+        for index, bib in enumerate(teamInfo.Bibs):
+            self.LapCounts[bib] = self.LapCounts.get(bib, 0) + 1
+            key = (teamInfo.Id, teamInfo.PassTimes[index])
+            self.LapIndexes.setdefault(key, index)
+
     def reset(self):
+        self.ResetCount += 1
         self.Log = []
+        self.LapCounts = {}
+        self.LapIndexes = {}
         self.StartInfo.reset()
         self.Classes = {}
 
@@ -159,9 +417,10 @@ class Report:
             self.Classes[classId] = ClassInfo(classId)
             teamIdsInClass = self.Config.getTeamIdsInClass(classId)
             for teamId in teamIdsInClass:
-                self.Classes[classId].Teams[teamId] = TeamInfo(teamId)
+                self.Classes[classId].add_team(TeamInfo(teamId))
 
     # Parses one log line and updates report
+    @stats.timed('Report.update')
     def update(self, logline):
         if len(logline) == 0:
             return
@@ -188,74 +447,74 @@ class Report:
                 Note("Class has not yet started")
                 return False
 
+            classInfo = self.Classes[classId]
+
             # Register the lap
-            newLap = teamInfo.add_lap(startTime, timestamp, bib)
+            oldKey = classInfo._get_key(teamInfo, teamInfo.Order)
+            teamInfo.add_lap(startTime, timestamp, bib)
             self.Log.append((timestamp, int(bib)))
-            lapCount = len(teamInfo.Laps)
-
-            # Now that the lap is registered, we can update current rank for all teams
-            rankList = []
-            rank = 1
-            for t in sorted(iter(self.Classes[classId].Teams.values()), key=cmp_to_key(compareTeams)):
-                if len(t.Laps) > 0:
-                    t.Rank = rank
-                    rank += 1
-                rankList.append(t.Id)
-            newLap.Rank = teamInfo.Rank
+            lapCount = teamInfo.get_lap_count()
+            lapIndex = lapCount - 1
+            self.LapCounts[bib] = self.LapCounts.get(bib, 0) + 1
+            self.LapIndexes.setdefault((teamId, timestamp), lapIndex)
+
+            # Now that the lap is registered, we can update current rank.
+            # Only the team that passed and the teams it overtook change.
+            classInfo.update_rank(teamInfo, oldKey)
+            teamInfo.Ranks[lapIndex] = teamInfo.Rank
 
             rankIndex = teamInfo.Rank - 1
-            self.Classes[classId].RankList = rankList
+            rankList = classInfo.RankList
 
             # It is now also possible to calculate lag time behind the team
             # one position up
             # It is also possible to calculate the lead time of that team
             # to this team
-            teamLapList = teamInfo.Laps
             # Special case if there is only one ranked team in the list to
             # avoid out of range errors in the rest of the code...
             if len(rankList) == 1:
-                newLap.Lead = ""
-                newLap.Lag = ""
+                teamInfo.set_lead(lapIndex, GAP_EMPTY)
+                teamInfo.set_lag(lapIndex, GAP_EMPTY)
             else:
                 # Unless team is last team, we can calculate
                 # * Lead time to the worse team
                 if teamInfo.Rank < len(rankList):
                     worseTeamId = rankList[rankIndex + 1]
-                    newLap.DownTeamId = worseTeamId
-                    worseTeamLapList = self._get_lap_list(worseTeamId)
-                    worseTeamLapCount = len(worseTeamLapList)
+                    teamInfo.DownTeamIds[lapIndex] = worseTeamId
+                    worseTeamInfo = self._get_team_info(worseTeamId)
+                    worseTeamLapCount = worseTeamInfo.get_lap_count()
                     lapLead = lapCount - worseTeamLapCount - 1
                     if lapCount > 1:
                         if lapLead == 0:
-                            diff = worseTeamLapList[lapCount - 2].PassTime \
-                                - teamLapList[lapCount - 2].PassTime
+                            diff = worseTeamInfo.PassTimes[lapCount - 2] \
+                                - teamInfo.PassTimes[lapCount - 2]
                             # If the diff is negative, it means this team has
                             # passed one or more teams since last lap
                             if diff < 0:
-                                newLap.Lead = "Plockar!"
+                                teamInfo.set_lead(lapIndex, GAP_PASSING)
                             else:
-                                newLap.Lead = '(-' + time_to_string(diff) + ')'
+                                teamInfo.set_lead(lapIndex, GAP_PREVIOUS_TIME,
+                                                  diff)
 
                         else:
-                            newLap.Lead = "-" + str(lapLead) + "v"
+                            teamInfo.set_lead(lapIndex, GAP_LAPS, lapLead)
 
                 # Unless team is leading team, we can calculate
                 # * Lag time after the better team
                 if teamInfo.Rank > 1:
                     betterTeamId = rankList[rankIndex - 1]
-                    newLap.UpTeamId = betterTeamId
-                    betterTeamLapList = self._get_lap_list(betterTeamId)
-                    betterTeamLapInfo = betterTeamLapList[lapCount - 1]
-                    if len(betterTeamLapList) == len(teamLapList):
-                        diff =  teamLapList[lapCount - 1].PassTime \
-                            - betterTeamLapList[lapCount - 1].PassTime
-                        diffStr = time_to_string(diff)
-                        newLap.Lag = "+" + diffStr
-                        betterTeamLapInfo.Lead = "-" + diffStr
+                    teamInfo.UpTeamIds[lapIndex] = betterTeamId
+                    betterTeamInfo = self._get_team_info(betterTeamId)
+                    betterTeamLapCount = betterTeamInfo.get_lap_count()
+                    if betterTeamLapCount == lapCount:
+                        diff = teamInfo.PassTimes[lapIndex] \
+                            - betterTeamInfo.PassTimes[lapIndex]
+                        teamInfo.set_lag(lapIndex, GAP_TIME, diff)
+                        betterTeamInfo.set_lead(lapIndex, GAP_TIME, diff)
                     else:
-                        lapDiff = len(betterTeamLapList) - len(teamLapList)
-                        newLap.Lag = "+" + str(lapDiff) + "v"
-                        betterTeamLapInfo.Lead = "-" + str(lapDiff) + "v"
+                        lapDiff = betterTeamLapCount - lapCount
+                        teamInfo.set_lag(lapIndex, GAP_LAPS, lapDiff)
+                        betterTeamInfo.set_lead(lapIndex, GAP_LAPS, lapDiff)
 
         else:
             Error("Could not interpret log line: " + logline)
@@ -264,10 +523,72 @@ class Report:
         # Everything went well
         return True
 
+    # Returns the state of the report as a structure of lists and
+    # dictionaries that can be stored as JSON and given to loadCheckpoint.
+    def getCheckpoint(self):
+        teams = {}
+        for classId, classInfo in self.Classes.items():
+            for teamId, teamInfo in classInfo.Teams.items():
+                if teamInfo.get_lap_count() > 0:
+                    teams[str(teamId)] = {'Rank': teamInfo.Rank,
+                                          'Laps': teamInfo.get_columns()}
+        startTimes = {}
+        for classId, startTime in self.StartInfo.StartTimes.items():
+            startTimes[str(classId)] = startTime
+        times = array.array('d', [timestamp for timestamp, bib in self.Log])
+        bibs = array.array('l', [bib for timestamp, bib in self.Log])
+        return {'StartTimes': startTimes,
+                'Log': {'Times': encode_array(times),
+                        'Bibs': encode_array(bibs)},
+                'Teams': teams}
+
+    # Restores the state of the report from a checkpoint returned by
+    # getCheckpoint. Returns False and leaves the report reset if the
+    # checkpoint does not match the configuration.
+    @stats.timed('Report.loadCheckpoint')
+    def loadCheckpoint(self, checkpoint):
+        self.reset()
+        try:
+            for classIdText, startTime in checkpoint['StartTimes'].items():
+                classId = int(classIdText)
+                if not classId in self.Classes:
+                    raise KeyError(classId)
+                self.StartInfo.StartTimes[classId] = startTime
+
+            for teamIdText, team in checkpoint['Teams'].items():
+                teamInfo = self._get_team_info(int(teamIdText))
+                teamInfo.set_columns(team['Laps'])
+                teamInfo.Rank = team['Rank']
+
+            times = decode_array('d', checkpoint['Log']['Times'])
+            bibs = decode_array('l', checkpoint['Log']['Bibs'])
+            if len(times) != len(bibs):
+                raise ValueError("Log columns have different lengths")
+            self.Log = list(zip(times.tolist(), bibs.tolist()))
+        except (KeyError, ValueError, TypeError):
+            Note("Checkpoint does not match the configuration")
+            self.reset()
+            return False
+
+        for classInfo in self.Classes.values():
+            classInfo.restore_rank()
+            for teamId, teamInfo in classInfo.Teams.items():
+                self._index_laps(teamInfo)
+        return True
+
     # Returns a list of (time, bib) pairs of valid registered laps
     def getLapLog(self):
         return list(self.Log)
 
+    # Returns the number of valid registered laps
+    def getLapLogSize(self):
+        return len(self.Log)
+
+    # Returns a list of (time, bib) pairs of the laps registered after the
+    # first index laps
+    def getLapLogFrom(self, index):
+        return self.Log[index:]
+
     # Returns an ordered list with teamIds sorted by rank. Best team first.
     def getTeamRankings(self, classId):
         return list(self.Classes[classId].RankList)
@@ -276,10 +597,10 @@ class Report:
         return self._get_team_info(teamId).Rank
 
     def getPreviousTeamRanking(self, teamId):
-        laps = self._get_team_info(teamId).Laps
-        if len(laps) < 2:
+        ranks = self._get_team_info(teamId).Ranks
+        if len(ranks) < 2:
             return ""
-        return laps[-2].Rank
+        return ranks[-2]
 
     def getStartTime(self, classId):
         try:
@@ -288,12 +609,12 @@ class Report:
             return None
 
     def getLastLapTime(self, teamId):
-        lapList = self._get_lap_list(teamId)
-        if len(lapList) > 0:
-            return lapList[-1].LapTime
+        lapTimes = self._get_team_info(teamId).LapTimes
+        if len(lapTimes) > 0:
+            return lapTimes[-1]
         return None
 
-    # Returns a list of LapInfo
+    # Returns a sequence of LapInfo
     def getLapInfoList(self, teamId):
         return self._get_lap_list(teamId)
 
@@ -306,12 +627,10 @@ class Report:
 
     # Returns the LapInfo of a team at a specific timestamp
     def getLapInfoByTimestamp(self, teamId, timestamp):
-        if not teamId in self.Config.getTeamIdList():
+        index = self.LapIndexes.get((teamId, timestamp))
+        if index is None:
             return None
-        for lap in self._get_lap_list(teamId):
-            if lap.PassTime == timestamp:
-                return lap
-        return None
+        return LapInfo(self._get_team_info(teamId), index)
 
     # Gets lapinfo by index. Index starts at 0
     def getLapInfoByIndex(self, teamId, index):
@@ -325,33 +644,21 @@ class Report:
 
     # Returns a list of (time, bib)
     def getLapList(self, teamId):
-        result = []
-        for lapInfo in self._get_lap_list(teamId):
-            result.append((lapInfo.PassTime, lapInfo.Bib))
-
-        return result
+        teamInfo = self._get_team_info(teamId)
+        return list(zip(teamInfo.PassTimes, teamInfo.Bibs))
 
     # Returns the total number of laps of a person
     def getLapCountByBib(self, bib):
-        teamId = self.Config.getTeamIdByBib(bib)
-
-        laps = 0
-        for lapInfo in self._get_lap_list(teamId):
-            if lapInfo.Bib == bib:
-                laps += 1
-        return laps
+        return self.LapCounts.get(bib, 0)
 
     # Returns the total number of laps of a team
     def getLapCountByTeamId(self, teamId):
-        return len(self._get_lap_list(teamId))
+        return self._get_team_info(teamId).get_lap_count()
 
     # Returns a list of (lapTime, bib)
     def getLapTimes(self, teamId):
-        result = []
-        for lapInfo in self._get_lap_list(teamId):
-            result.append((lapInfo.LapTime, lapInfo.Bib))
-
-        return result
+        teamInfo = self._get_team_info(teamId)
+        return list(zip(teamInfo.LapTimes, teamInfo.Bibs))
 
     # Returns the timestamp for a team's indexth lap
     def getLapTimeStamp(self, teamId, index):
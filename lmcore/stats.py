@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+    stats.py
+
+    Collects call counts and latency histograms of selected functions, so
+    that it can be seen where time goes during a live race without attaching
+    a profiler.
+
+    Collection is off unless the environment variable LAPMASTER_STATS is set
+    to something else than 0 when lmcore is imported. Functions are
+    instrumented with the timed decorator, which returns the function as it
+    is when collection is off, so that it costs nothing.
+
+    Example:
+    from lmcore import stats
+
+    @stats.timed('Report.update')
+    def update(self, logline):
+        ...
+
+    with stats.timer('index.html'):
+        ...
+
+    stats.dump()
+
+    :copyright: (c) 2016 by Robert Johansson.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import os
+import sys
+import atexit
+import time
+import threading
+
+ENABLED = os.environ.get('LAPMASTER_STATS', '0') not in ('', '0')
+
+# Histogram bucket i holds durations of less than 2**i microseconds that did
+# not fit in bucket i - 1. The last bucket holds everything longer.
+BUCKET_COUNT = 32
+
+class Stat:
+    def __init__(self, name):
+        self.Name = name
+        self.Count = 0
+        self.Total = 0.0
+        self.Max = 0.0
+        self.Buckets = [0] * BUCKET_COUNT
+
+    def add(self, seconds):
+        self.Count += 1
+        self.Total += seconds
+        if seconds > self.Max:
+            self.Max = seconds
+        bucket = int(seconds * 1000000).bit_length()
+        self.Buckets[min(bucket, BUCKET_COUNT - 1)] += 1
+
+    # Returns the upper bound in seconds of the bucket holding percentile
+    # percent of the durations, or 0 if nothing has been added.
+    def getPercentile(self, percent):
+        if self.Count == 0:
+            return 0.0
+        limit = self.Count * percent / 100.0
+        count = 0
+        for bucket in range(BUCKET_COUNT):
+            count += self.Buckets[bucket]
+            if count >= limit:
+                break
+        return min(float(2 ** bucket) / 1000000, self.Max)
+
+    def toDict(self):
+        mean = 0.0
+        if self.Count > 0:
+            mean = self.Total / self.Count
+        # Mapping from the upper bound in microseconds of each used bucket to
+        # the number of durations in it
+        histogram = {}
+        for bucket in range(BUCKET_COUNT):
+            if self.Buckets[bucket] > 0:
+                histogram[str(2 ** bucket)] = self.Buckets[bucket]
+        return {'count': self.Count,
+                'total': self.Total,
+                'mean': mean,
+                'max': self.Max,
+                'p50': self.getPercentile(50),
+                'p90': self.getPercentile(90),
+                'p99': self.getPercentile(99),
+                'histogram': histogram}
+
+# Mapping from name to Stat
+stats = {}
+lock = threading.Lock()
+
+def add(name, seconds):
+    with lock:
+        stat = stats.get(name)
+        if stat is None:
+            stat = Stat(name)
+            stats[name] = stat
+        stat.add(seconds)
+
+def reset():
+    with lock:
+        stats.clear()
+
+# Returns a mapping from name to a JSON friendly dict of each stat
+def get_stats():
+    with lock:
+        return dict((name, stat.toDict()) for name, stat in stats.items())
+
+# Decorator which adds the duration of each call of the function to the stat
+# called name.
+def timed(name):
+    def decorate(function):
+        if not ENABLED:
+            return function
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                add(name, time.perf_counter() - start)
+        wrapper.__name__ = function.__name__
+        wrapper.__doc__ = function.__doc__
+        return wrapper
+    return decorate
+
+class Timer:
+    def __init__(self, name):
+        self.Name = name
+
+    def __enter__(self):
+        self.Start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        add(self.Name, time.perf_counter() - self.Start)
+        return False
+
+class NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_TIMER = NullTimer()
+
+# Returns a context manager which adds the time spent in its block to the
+# stat called name.
+def timer(name):
+    if not ENABLED:
+        return NULL_TIMER
+    return Timer(name)
+
+# Writes a table of all stats, slowest in total first, to f
+def dump(f=None):
+    if f is None:
+        f = sys.stderr
+    data = get_stats()
+    f.write("%-36s %9s %10s %10s %10s %10s %10s\n" %
+            ("name", "count", "total s", "mean ms", "p50 ms", "p99 ms",
+             "max ms"))
+    for name in sorted(data, key=lambda x: -data[x]['total']):
+        stat = data[name]
+        f.write("%-36s %9d %10.3f %10.3f %10.3f %10.3f %10.3f\n" %
+                (name, stat['count'], stat['total'], stat['mean'] * 1000,
+                 stat['p50'] * 1000, stat['p99'] * 1000,
+                 stat['max'] * 1000))
+
+# Dumps the stats when the program exits, if collection is on
+def dump_at_exit():
+    if ENABLED:
+        atexit.register(dump)
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+    testcheckpoint.py
+
+    :copyright: (c) 2016 by Robert Johansson.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import unittest
+import os
+import lmcore
+import logger
+
+CLASSES = 'test-data/classes-test.csv'
+PERSONS = 'test-data/persons-test.csv'
+TEAMS = 'test-data/teams-test.csv'
+TEST_FILE_NAME = '/tmp/lmcore_testcheckpoint.json'
+CHANGED_TEAMS = '/tmp/lmcore_testcheckpoint_teams.csv'
+
+LOG = ['1314227943,start all',
+       '1314227944,1',
+       '1314227954,3',
+       '1314227957,2',
+       '1314227960,5',
+       '1314227963,4',
+       '1314227966,6',
+       '1314228000,1']
+
+def text(lines):
+    return ''.join([line + '\n' for line in lines])
+
+class CountingReport(lmcore.Report):
+    def reset(self):
+        lmcore.Report.reset(self)
+        self.Updates = 0
+
+    def update(self, logline):
+        self.Updates += 1
+        return lmcore.Report.update(self, logline)
+
+class TestCheckpointer(unittest.TestCase):
+    def setUp(self):
+        # lmcore.logger is a different module than logger in the tests
+        self.Loggers = (logger.logger, lmcore.logger.logger)
+        logger.logger = logger.NullLogger()
+        lmcore.logger.logger = logger.NullLogger()
+        self.Config = lmcore.loadConfig(CLASSES, PERSONS, TEAMS)
+        self.Report = CountingReport(self.Config)
+        self.Checkpointer = lmcore.Checkpointer(self.Report, TEST_FILE_NAME, 3)
+        self.Checkpointer.update(text(LOG[:7]))
+
+    def tearDown(self):
+        logger.logger, lmcore.logger.logger = self.Loggers
+        for path in [TEST_FILE_NAME, CHANGED_TEAMS]:
+            if os.path.exists(path):
+                os.unlink(path)
+
+    def test_checkpoints_are_saved(self):
+        self.assertEqual(2, len(self.Checkpointer.Checkpoints))
+        self.assertTrue(os.path.exists(TEST_FILE_NAME))
+
+    def test_resync_replays_after_checkpoint(self):
+        self.Checkpointer.resync(text(LOG))
+        # Checkpoint at line 6, so lines 7 and 8 are replayed
+        self.assertEqual(2, self.Report.Updates)
+        self.assertEqual([1, 3, 2], self.Report.getTeamRankings(1))
+        self.assertEqual(7, len(self.Report.getLapLog()))
+
+    def test_resync_after_changed_line(self):
+        log = list(LOG)
+        log[5] = '1314227963,!!!!'
+        self.Checkpointer.resync(text(log))
+        # Checkpoint at line 3 is the latest that matches
+        self.assertEqual(5, self.Report.Updates)
+        self.assertEqual(6, len(self.Report.getLapLog()))
+
+    def test_resync_from_saved_checkpoints(self):
+        report = CountingReport(self.Config)
+        checkpointer = lmcore.Checkpointer(report, TEST_FILE_NAME, 3)
+        checkpointer.resync(text(LOG))
+        self.assertEqual(2, report.Updates)
+        self.assertEqual([1, 3, 2], report.getTeamRankings(1))
+        self.assertEqual([(1314227944, 1), (1314228000, 1)],
+                         report.getLapList(1))
+
+    def test_changed_config_replays_everything(self):
+        # Bibs 9 and 12 have changed teams
+        with open(CHANGED_TEAMS, 'w') as f:
+            f.write('3,Tre Herrar,7,8,12\n3,Tre Damer,10,11,9\n')
+        config = lmcore.loadConfig(CLASSES, PERSONS, CHANGED_TEAMS)
+        self.assertNotEqual(self.Config.getFingerprint(),
+                            config.getFingerprint())
+        report = CountingReport(config)
+        checkpointer = lmcore.Checkpointer(report, TEST_FILE_NAME, 3)
+        checkpointer.resync(text(LOG))
+        self.assertEqual(len(LOG), report.Updates)
+
+    def test_resync_saves_one_checkpoint(self):
+        report = CountingReport(self.Config)
+        checkpointer = lmcore.Checkpointer(report, None, 3)
+        checkpointer.resync(text(LOG))
+        self.assertEqual(1, len(checkpointer.Checkpoints))
+        self.assertEqual(len(text(LOG)), checkpointer.Checkpoints[0]['Offset'])
+
+    def test_bad_line_is_skipped(self):
+        report = CountingReport(self.Config)
+        checkpointer = lmcore.Checkpointer(report, None, 3)
+        log = LOG[:3] + ['1314227955,9999'] + LOG[3:]
+        checkpointer.update(text(log))
+        self.assertEqual(7, len(report.getLapLog()))
+        self.assertEqual(len(text(log)), checkpointer.Offset)
+        # The checkpoints match the log, bad line included
+        checkpoint = checkpointer.find(text(log).encode('utf-8'))
+        self.assertEqual(len(text(log)), checkpoint['Offset'])
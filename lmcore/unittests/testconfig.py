@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+    testconfig.py
+
+    :copyright: (c) 2016 by Robert Johansson.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import unittest
+import clazz
+import person
+import team
+import config
+
+CID_SOLO = 1
+CID_TEAM = 2
+CID_EMPTY = 3
+
+class TestConfig(unittest.TestCase):
+    def setUp(self):
+        classes = {}
+        classes[CID_SOLO] = clazz.Class(CID_SOLO, 1, 'Solo')
+        classes[CID_TEAM] = clazz.Class(CID_TEAM, 2, 'Team')
+        classes[CID_EMPTY] = clazz.Class(CID_EMPTY, 2, 'Empty')
+        persons = {}
+        persons[12] = person.Person(12, 'Bertil S')
+        persons[11] = person.Person(11, 'Anna S')
+        persons[22] = person.Person(22, 'Anders T')
+        persons[21] = person.Person(21, 'Alva T')
+        teams = {}
+        teams[11] = team.Team(CID_SOLO, 'Anna S', [11])
+        teams[12] = team.Team(CID_SOLO, 'Bertil S', [12])
+        teams[21] = team.Team(CID_TEAM, 'Lag A', [22, 21])
+        self.Config = config.Config(classes, persons, teams)
+
+    def test_person_bib_list_is_sorted(self):
+        self.assertEqual([11, 12, 21, 22], self.Config.getPersonBibList())
+
+    def test_person_bib_list_is_a_copy(self):
+        self.Config.getPersonBibList().append(99)
+        self.assertEqual([11, 12, 21, 22], self.Config.getPersonBibList())
+
+    def test_team_lookup_by_bib(self):
+        self.assertEqual(21, self.Config.getTeamIdByBib(22))
+        self.assertEqual('Lag A', self.Config.getTeamNameByBib(22))
+        self.assertEqual([22, 21], self.Config.getTeamBibsByBib(21))
+        self.assertEqual(CID_TEAM, self.Config.getClassIdByBib(22))
+
+    def test_unknown_bib(self):
+        self.assertEqual(None, self.Config.getTeamIdByBib(99))
+        self.assertEqual(None, self.Config.getTeamNameByBib(99))
+        self.assertEqual([], self.Config.getTeamBibsByBib(99))
+        self.assertRaises(KeyError, self.Config.getClassIdByBib, 99)
+
+    def test_team_lookup_by_team_id(self):
+        self.assertEqual('Lag A', self.Config.getTeamNameByTeamId(21))
+        self.assertEqual(None, self.Config.getTeamNameByTeamId(22))
+        self.assertEqual([22, 21], self.Config.getTeamBibsByTeamId(21))
+        self.assertEqual([], self.Config.getTeamBibsByTeamId(22))
+
+    def test_team_ids_in_class(self):
+        self.assertEqual([11, 12], self.Config.getTeamIdsInClass(CID_SOLO))
+        self.assertEqual([21], self.Config.getTeamIdsInClass(CID_TEAM))
+        self.assertEqual([], self.Config.getTeamIdsInClass(CID_EMPTY))
+
+    def test_build_index_after_modification(self):
+        self.Config.Persons[13] = person.Person(13, 'Carina S')
+        self.Config.Teams[13] = team.Team(CID_SOLO, 'Carina S', [13])
+        self.Config.buildIndex()
+        self.assertEqual(13, self.Config.getTeamIdByBib(13))
+        self.assertEqual([11, 12, 13, 21, 22], self.Config.getPersonBibList())
+        self.assertEqual([11, 12, 13], self.Config.getTeamIdsInClass(CID_SOLO))
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+    testconfigloader.py
+
+    :copyright: (c) 2016 by Robert Johansson.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import unittest
+import os
+import lmcore.logger
+from lmcore.configloader import loadConfig
+
+CLASSES = '/tmp/lmcore_testclasses.csv'
+PERSONS = '/tmp/lmcore_testpersons.csv'
+TEAMS = '/tmp/lmcore_testteams.csv'
+
+class RecordingLogger(lmcore.logger.NullLogger):
+    def __init__(self):
+        self.Errors = []
+
+    def Error(self, msg):
+        self.Errors.append(msg)
+
+def write(path, lines):
+    with open(path, 'w') as f:
+        for line in lines:
+            f.write(line + '\n')
+
+class TestConfigLoader(unittest.TestCase):
+    def setUp(self):
+        self.OldLogger = lmcore.logger.logger
+        self.Logger = RecordingLogger()
+        lmcore.logger.logger = self.Logger
+        write(CLASSES, ['1,1,Solo', '2,2,Team'])
+        write(PERSONS, ['s,1,1,Anna S', 's,1,2,Bertil S', '3,Alva T',
+                        '4,Anders T'])
+        write(TEAMS, ['2,Lag A,3,4'])
+
+    def tearDown(self):
+        lmcore.logger.logger = self.OldLogger
+        for path in [CLASSES, PERSONS, TEAMS]:
+            if os.path.isfile(path):
+                os.remove(path)
+
+    def test_valid_config(self):
+        config = loadConfig(CLASSES, PERSONS, TEAMS)
+        self.assertNotEqual(None, config)
+        self.assertEqual([], self.Logger.Errors)
+        self.assertEqual(3, config.getTeamIdByBib(4))
+
+    def test_duplicate_class_name(self):
+        write(CLASSES, ['1,1,Solo', '2,2,Team', '3,2,Solo'])
+        self.assertEqual(None, loadConfig(CLASSES, PERSONS, TEAMS))
+        self.assertEqual([CLASSES + ": 3: There is already a class with "
+                          "name Solo"], self.Logger.Errors[:1])
+
+    def test_duplicate_team_name(self):
+        write(TEAMS, ['2,Anna S,3,4'])
+        self.assertEqual(None, loadConfig(CLASSES, PERSONS, TEAMS))
+        self.assertEqual(TEAMS + ": 1: There is already a team called Anna S",
+                         self.Logger.Errors[0])
+
+    def test_person_in_two_teams(self):
+        write(TEAMS, ['2,Lag A,3,4', '2,Lag B,4'])
+        loadConfig(CLASSES, PERSONS, TEAMS)
+        self.assertEqual(TEAMS + ": 2: Person with number 4 is already in "
+                         "another team.", self.Logger.Errors[0])
+
+    def test_person_twice_in_team(self):
+        write(TEAMS, ['2,Lag A,3,3'])
+        loadConfig(CLASSES, PERSONS, TEAMS)
+        self.assertEqual(TEAMS + ": 1: Person with number 3 is already in "
+                         "team.", self.Logger.Errors[0])
+
+    def test_unknown_class(self):
+        write(PERSONS, ['s,1,1,Anna S', 's,5,2,Bertil S', '3,Alva T',
+                        '4,Anders T'])
+        loadConfig(CLASSES, PERSONS, TEAMS)
+        self.assertEqual(PERSONS + ": 2: No class with id 5 is defined.",
+                         self.Logger.Errors[0])
+
+    def test_person_without_team(self):
+        write(TEAMS, ['2,Lag A,3'])
+        self.assertEqual(None, loadConfig(CLASSES, PERSONS, TEAMS))
+        self.assertEqual(["Person 4 Anders T is not in any team"],
+                         self.Logger.Errors)
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+    testlog.py
+
+    :copyright: (c) 2016 by Robert Johansson.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import unittest
+import os
+import lmcore
+
+TEST_FILE_NAME = '/tmp/lmcore_testlog.csv'
+
+def read_file(path):
+    with open(path, 'r') as f:
+        return f.read()
+
+class TestLogWriting(unittest.TestCase):
+    def setUp(self):
+        self.Log = lmcore.Log([])
+        self.Log.append(100.5, 'start all')
+        self.Log.append(200.5, '1')
+        lmcore.saveLog(self.Log, TEST_FILE_NAME)
+
+    def tearDown(self):
+        os.unlink(TEST_FILE_NAME)
+
+    def test_save(self):
+        self.assertEqual("100.5,start all\n200.5,1\n",
+                         read_file(TEST_FILE_NAME))
+
+    def test_append(self):
+        self.Log.append(300.5, '2')
+        lmcore.appendLog(self.Log, TEST_FILE_NAME)
+        self.assertEqual("100.5,start all\n200.5,1\n300.5,2\n",
+                         read_file(TEST_FILE_NAME))
+
+    def test_append_does_not_rewrite_existing_lines(self):
+        with open(TEST_FILE_NAME, 'w') as f:
+            f.write("100.50,start all\n200.50,1")
+        self.Log.append(300.5, '2')
+        lmcore.appendLog(self.Log, TEST_FILE_NAME)
+        self.assertEqual("100.50,start all\n200.50,1\n300.5,2\n",
+                         read_file(TEST_FILE_NAME))
+
+    def test_append_several(self):
+        self.Log.append(300.5, '2')
+        self.Log.append(400.5, '3')
+        lmcore.appendLog(self.Log, TEST_FILE_NAME, 2)
+        self.assertEqual("100.5,start all\n200.5,1\n300.5,2\n400.5,3\n",
+                         read_file(TEST_FILE_NAME))
+
+    def test_patch(self):
+        self.Log.append(300.5, '2')
+        self.Log.append(400.5, '3')
+        lmcore.appendLog(self.Log, TEST_FILE_NAME, 2)
+        self.Log.set(2, '!!!!')
+        lmcore.patchLog(self.Log, TEST_FILE_NAME, 2)
+        self.assertEqual("100.5,start all\n200.5,1\n300.5,!!!!\n400.5,3\n",
+                         read_file(TEST_FILE_NAME))
+
+    def test_patch_shorter_event(self):
+        self.Log.set(1, '!!!!')
+        lmcore.patchLog(self.Log, TEST_FILE_NAME, 1)
+        self.Log.set(1, '7')
+        lmcore.patchLog(self.Log, TEST_FILE_NAME, 1)
+        self.assertEqual("100.5,start all\n200.5,7\n",
+                         read_file(TEST_FILE_NAME))
+
+class TestLogIndex(unittest.TestCase):
+    def setUp(self):
+        self.Config = lmcore.loadConfig('test-data/classes-test.csv',
+                                        'test-data/persons-test.csv',
+                                        'test-data/teams-test.csv')
+        self.IndexPath = TEST_FILE_NAME + lmcore.log.INDEX_SUFFIX
+        with open(TEST_FILE_NAME, 'w') as f:
+            f.write("100.5,start 1 2\n200.25,1\n300.5,!!!!\n400.5,012\n"
+                    "500.5,start 3\n600.75,7\n")
+
+    def tearDown(self):
+        for path in [TEST_FILE_NAME, self.IndexPath]:
+            if os.path.isfile(path):
+                os.unlink(path)
+
+    def test_index_is_only_written_when_used(self):
+        lmcore.loadLog(TEST_FILE_NAME, self.Config)
+        self.assertFalse(os.path.isfile(self.IndexPath))
+
+    def test_load_from_index(self):
+        log, startInfo = lmcore.loadLog(TEST_FILE_NAME, self.Config, True)
+        self.assertTrue(os.path.isfile(self.IndexPath))
+        stat = os.stat(TEST_FILE_NAME)
+        self.assertEqual(log.Events,
+                         lmcore.log.readIndex(self.IndexPath, stat))
+        indexed, indexedStartInfo = lmcore.loadLog(TEST_FILE_NAME,
+                                                   self.Config, True)
+        self.assertEqual(log.Events, indexed.Events)
+        self.assertEqual(startInfo.StartTimes, indexedStartInfo.StartTimes)
+
+    def test_events_that_are_not_plain_numbers(self):
+        with open(TEST_FILE_NAME, 'a') as f:
+            f.write("700.5,\u00b2\n800.5,99999999999999999999\n")
+        log, startInfo = lmcore.loadLog(TEST_FILE_NAME, self.Config, True)
+        self.assertEqual(log.Events,
+                         lmcore.log.readIndex(self.IndexPath,
+                                              os.stat(TEST_FILE_NAME)))
+
+    def test_index_with_start_of_removed_class(self):
+        lmcore.loadLog(TEST_FILE_NAME, self.Config, True)
+        del self.Config.Classes[3]
+        self.assertEqual((None, None),
+                         lmcore.loadLog(TEST_FILE_NAME, self.Config, True))
+
+    def test_stale_index_is_rebuilt(self):
+        lmcore.loadLog(TEST_FILE_NAME, self.Config, True)
+        with open(TEST_FILE_NAME, 'a') as f:
+            f.write("700.5,5\n")
+        self.assertEqual(None, lmcore.log.readIndex(self.IndexPath,
+                                                    os.stat(TEST_FILE_NAME)))
+        log, startInfo = lmcore.loadLog(TEST_FILE_NAME, self.Config, True)
+        self.assertEqual((700.5, '5'), log[-1])
+        self.assertEqual(log.Events,
+                         lmcore.log.readIndex(self.IndexPath,
+                                              os.stat(TEST_FILE_NAME)))
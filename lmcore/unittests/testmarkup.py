@@ -8,6 +8,7 @@
 
 import unittest
 from markup import MarkupNode
+import io
 
 class TestCompareTeams(unittest.TestCase):
 
@@ -41,3 +42,24 @@ class TestCompareTeams(unittest.TestCase):
         link.setAttribute('rel', 'stylesheet')
         link.setAttribute('type', 'text/css')
         link.setAttribute('href', 'lapmaster.css');
+
+    def test_raw(self):
+        m = MarkupNode('div')
+        m.addRaw('<p>Hello</p>\n')
+        m.addChild('p', 'World')
+        self.assertEqual("<div><p>Hello</p>\n<p>World</p>\n</div>\n", str(m))
+
+    def test_raw_from_node(self):
+        p = MarkupNode('p', "Hello")
+        p.setAttribute('class', 'number')
+        m = MarkupNode('div')
+        m.addRaw(str(p))
+        self.assertEqual('<div><p class="number">Hello</p>\n</div>\n',
+                         str(m))
+
+    def test_write(self):
+        m = MarkupNode('div')
+        m.addChild('p', 'Hello')
+        f = io.StringIO()
+        m.write(f)
+        self.assertEqual(str(m), f.getvalue())
@@ -7,6 +7,7 @@
 """
 
 import unittest
+import random
 import report
 import clazz
 import team
@@ -36,6 +37,29 @@ class TestCompareTeams(unittest.TestCase):
         self.assertEqual(1, report.compareTeams(resultC, resultB))
         self.assertEqual(0, report.compareTeams(resultA, resultA))
 
+class TestTeamInfo(unittest.TestCase):
+    def test_laps_are_views_of_the_columns(self):
+        teamInfo = report.TeamInfo(1)
+        teamInfo.add_lap(0, 100, 1)
+        teamInfo.add_lap(0, 250, 2)
+        self.assertEqual(2, len(teamInfo.Laps))
+        self.assertEqual(150, teamInfo.Laps[-1].LapTime)
+        self.assertEqual([1, 2], [lap.Bib for lap in teamInfo.Laps])
+        self.assertEqual([250], [lap.PassTime for lap in teamInfo.Laps[1:]])
+        self.assertEqual(None, teamInfo.Laps[0].Lead)
+        self.assertEqual(None, teamInfo.Laps[0].UpTeamId)
+        self.assertRaises(IndexError, lambda: teamInfo.Laps[2])
+
+    def test_gaps(self):
+        teamInfo = report.TeamInfo(1)
+        teamInfo.add_lap(0, 100, 1)
+        teamInfo.set_lead(0, report.GAP_PREVIOUS_TIME, 73.5)
+        teamInfo.set_lag(0, report.GAP_LAPS, 4)
+        self.assertEqual("(-01:13)", teamInfo.Laps[0].Lead)
+        self.assertEqual("+4v", teamInfo.Laps[0].Lag)
+        teamInfo.set_lead(0, report.GAP_PASSING)
+        self.assertEqual("Plockar!", teamInfo.Laps[0].Lead)
+
 class TestReport(unittest.TestCase):
     def setUp(self):
         classes = {}
@@ -159,3 +183,87 @@ class TestReport(unittest.TestCase):
         self.event(1021, 1)
 
         self.assertEqual(11, self.Report.getLastLapTime(1))
+
+    def test_rank_list_is_empty_before_first_lap(self):
+        self.start()
+        self.assertEqual([], self.Report.getTeamRankings(CID))
+
+    def test_unranked_teams_keep_config_order(self):
+        self.start()
+        self.event(1000, 3)
+        self.assertEqual([3, 1, 2, 4], self.Report.getTeamRankings(CID))
+        self.assertEqual(None, self.Report.getTeamRanking(1))
+
+    def test_ranking_matches_full_sort(self):
+        rnd = random.Random(4711)
+        self.start()
+        for offset in range(1, 200):
+            # Equal pass times are allowed to test tie breaking
+            bib = rnd.choice([1, 2, 3, 4])
+            self.event(offset - offset % 3, bib)
+            teams = self.Report.Classes[CID].Teams.values()
+            expected = [t.Id for t in sorted(teams,
+                            key=report.cmp_to_key(report.compareTeams))]
+            self.assertEqual(expected, self.Report.getTeamRankings(CID))
+            rank = 1
+            for teamId in expected:
+                if self.Report.getLapCountByTeamId(teamId) > 0:
+                    self.assertEqual(rank, self.Report.getTeamRanking(teamId))
+                    rank += 1
+            lapInfo = self.Report.getLastLapInfo(bib)
+            index = expected.index(bib)
+            if index > 0:
+                self.assertEqual(expected[index - 1], lapInfo.UpTeamId)
+            if index + 1 < len(expected):
+                self.assertEqual(expected[index + 1], lapInfo.DownTeamId)
+
+    def test_checkpoint(self):
+        self.start()
+        for offset, bib in [(100, 1), (102, 2), (104, 3), (150, 2), (160, 1)]:
+            self.event(offset, bib)
+        restored = report.Report(self.config)
+        self.assertTrue(restored.loadCheckpoint(self.Report.getCheckpoint()))
+        self.event(170, 4)
+        restored.update(str(START_TIME + 170) + ",4\n")
+        self.assertEqual(self.Report.getTeamRankings(CID),
+                         restored.getTeamRankings(CID))
+        self.assertEqual(self.Report.getLapLog(), restored.getLapLog())
+        self.assertEqual(START_TIME, restored.getStartTime(CID))
+        for teamId in [1, 2, 3, 4]:
+            self.assertEqual(str(self.Report.getLapInfoList(teamId)),
+                             str(restored.getLapInfoList(teamId)))
+            self.assertEqual(self.Report.getTeamRanking(teamId),
+                             restored.getTeamRanking(teamId))
+            self.assertEqual(self.Report.getLapCountByBib(teamId),
+                             restored.getLapCountByBib(teamId))
+        lapInfo = restored.getLapInfoByTimestamp(2, START_TIME + 150)
+        self.assertEqual(1, lapInfo.Rank)
+
+    def test_lap_count_by_bib(self):
+        self.start()
+        for offset, bib in [(100, 1), (102, 2), (150, 1)]:
+            self.event(offset, bib)
+        self.assertEqual(2, self.Report.getLapCountByBib(1))
+        self.assertEqual(1, self.Report.getLapCountByBib(2))
+        self.assertEqual(0, self.Report.getLapCountByBib(3))
+        self.Report.reset()
+        self.assertEqual(0, self.Report.getLapCountByBib(1))
+
+    def test_lap_info_by_timestamp(self):
+        self.start()
+        for offset, bib in [(100, 1), (102, 2), (150, 1)]:
+            self.event(offset, bib)
+        lapInfo = self.Report.getLapInfoByTimestamp(1, START_TIME + 150)
+        self.assertEqual(50, lapInfo.LapTime)
+        self.assertEqual(None,
+                         self.Report.getLapInfoByTimestamp(2, START_TIME + 150))
+        self.assertEqual(None,
+                         self.Report.getLapInfoByTimestamp(99, START_TIME + 150))
+
+    def test_checkpoint_for_other_config(self):
+        self.start()
+        self.event(100, 1)
+        checkpoint = self.Report.getCheckpoint()
+        checkpoint['Teams']['99'] = checkpoint['Teams']['1']
+        self.assertFalse(self.Report.loadCheckpoint(checkpoint))
+        self.assertEqual([], self.Report.getLapLog())
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+    teststats.py
+
+    :copyright: (c) 2016 by Robert Johansson.
+    :license: BSD, see LICENSE for more details.
+"""
+
+import unittest
+import io
+import lmcore
+from lmcore import stats
+
+class TestStat(unittest.TestCase):
+    def test_histogram(self):
+        stat = stats.Stat('test')
+        for seconds in [0.000001, 0.000003, 0.000003, 0.001]:
+            stat.add(seconds)
+        data = stat.toDict()
+        self.assertEqual(4, data['count'])
+        self.assertEqual(0.001, data['max'])
+        self.assertEqual({'2': 1, '4': 2, '1024': 1}, data['histogram'])
+        self.assertEqual(0.000004, stat.getPercentile(50))
+        self.assertEqual(0.001, stat.getPercentile(99))
+
+    def test_empty(self):
+        self.assertEqual(0.0, stats.Stat('test').getPercentile(50))
+
+class TestTimed(unittest.TestCase):
+    def setUp(self):
+        self.Enabled = stats.ENABLED
+        stats.reset()
+
+    def tearDown(self):
+        stats.ENABLED = self.Enabled
+        stats.reset()
+
+    def test_disabled_returns_function(self):
+        stats.ENABLED = False
+        def f():
+            pass
+        self.assertTrue(stats.timed('f')(f) is f)
+        with stats.timer('block'):
+            pass
+        self.assertEqual({}, stats.get_stats())
+
+    def test_enabled_counts_calls(self):
+        stats.ENABLED = True
+        @stats.timed('f')
+        def f(x):
+            return x * 2
+        self.assertEqual(4, f(2))
+        f(3)
+        with stats.timer('block'):
+            pass
+        data = stats.get_stats()
+        self.assertEqual(2, data['f']['count'])
+        self.assertEqual(1, data['block']['count'])
+        out = io.StringIO()
+        stats.dump(out)
+        self.assertEqual(3, len(out.getvalue().splitlines()))
+
+    def test_one_module_for_all_imports(self):
+        # The modules are also imported as top level modules in the tests
+        import config
+        import markup
+        import report
+        for module in [config, markup, report, lmcore.log]:
+            self.assertTrue(module.stats is stats)
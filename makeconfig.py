@@ -37,7 +37,16 @@ descriptions = {'ms': "Men solo",
                 "t3m": "Team 3 Mixed",
                 "t3l": "Team 3 Ladies",
                 "t6m": "Team 6 Mixed"}
-bibs= []
+
+# The bib scheme. For each class: option, class id, first digit of the team
+# numbers and number of persons per team. Solo persons get the team number as
+# bib, e.g. 101, 102 and so on. Team members get the team number followed by
+# their member number, e.g. 3011, 3012 and 3013 for team 301.
+classes = [('ms', 0, 1, 1),
+           ('ls', 1, 2, 1),
+           ('t3m', 2, 3, 3),
+           ('t3l', 3, 4, 3),
+           ('t6m', 4, 6, 6)]
 
 def show_usage():
     print("Usage: %s [help] [ms=<count>] [ls=<count>] [t3m=<count>] [t3l=<count>] [t6m=<count>]" % (os.path.basename(sys.argv[0])))
@@ -45,114 +54,120 @@ def show_usage():
     for k,v in descriptions.items():
         print("{:<5} {:<14} {}".format(k, v, options[k]))
 
-if len(sys.argv) < 2:
-    show_usage()
-    sys.exit(-1)
-
-error = False
-for arg in sys.argv[1:]:
-    if arg == "help":
-        error = True
-        break
-
-    try:
-        key, value = arg.split('=')
-    except:
-        error = True
-        print("Could not interpret option %s" % (key))
-        continue
-    if key in options:
+# Returns the number of digits in team numbers needed for the given counts.
+# With up to 99 teams per class the team numbers are 101-199, 201-299 and so
+# on. Larger counts give team numbers 1001-1999 and so on.
+def team_digits(counts):
+    return len(str(max(list(counts.values()) + [1]))) + 1
+
+# Returns a list of (class id, team number, list of bibs) for the number of
+# teams per class given in counts.
+def create_teams(counts):
+    base = 10 ** (team_digits(counts) - 1)
+    teams = []
+    for key, cid, digit, members in classes:
+        for i in range(digit * base + 1, digit * base + 1 + counts[key]):
+            if members == 1:
+                teams.append((cid, i, [i]))
+            else:
+                teams.append((cid, i, [i * 10 + m for m in range(1, members + 1)]))
+    return teams
+
+def write_classes(path):
+    with open(path, 'w') as f:
+        f.write("0,1,Herr solo\n")
+        f.write("1,1,Dam solo\n")
+        f.write("2,3,Mixed 3\n")
+        f.write("3,3,Dam 3\n")
+        f.write("4,6,Mixed 6\n")
+
+def write_persons(path, teams):
+    with open(path, 'w') as f:
+        for cid, teamId, bibs in teams:
+            if len(bibs) == 1 and bibs[0] == teamId:
+                f.write("s,%d,%d,Person %d\n" % (cid, teamId, teamId))
+        for cid, teamId, bibs in teams:
+            if bibs[0] != teamId:
+                for i in bibs:
+                    f.write("%d,Person %d\n" % (i, i))
+
+def write_teams(path, teams):
+    with open(path, 'w') as f:
+        for cid, teamId, bibs in teams:
+            if bibs[0] == teamId:
+                continue
+            text = "%d,Team %d" % (cid, teamId)
+            for bib in bibs:
+                text += ",%d" % (bib)
+            text += "\n"
+            f.write(text)
+
+# Writes classes.csv, persons.csv and teams.csv in directory. Returns the
+# list of teams as given by create_teams.
+def write_config(directory, counts):
+    teams = create_teams(counts)
+    write_classes(os.path.join(directory, CLASSFILE))
+    write_persons(os.path.join(directory, PERSONFILE), teams)
+    write_teams(os.path.join(directory, TEAMFILE), teams)
+    return teams
+
+def main():
+    if len(sys.argv) < 2:
+        show_usage()
+        sys.exit(-1)
+
+    error = False
+    for arg in sys.argv[1:]:
+        if arg == "help":
+            error = True
+            break
+
         try:
-            options[key] = int(value)
+            key, value = arg.split('=')
         except:
             error = True
-            print("Value of %s must be an integer" % (key))
+            print("Could not interpret option %s" % (arg))
+            continue
+        if key in options:
+            try:
+                options[key] = int(value)
+            except:
+                error = True
+                print("Value of %s must be an integer" % (key))
+                continue
+        else:
+            error = True
+            print("Unknown option %s" % (key))
             continue
-    else:
-        error = True
-        print("Unknown option %s" % (key))
-        continue
-
-if error:
-    show_usage()
-    sys.exit(-1)
-
-def classId(teamId):
-    if teamId >= 101 and teamId <= 199:
-        return 0
-    if teamId >= 201 and teamId <= 299:
-        return 1
-    if teamId >= 301 and teamId <= 399:
-        return 2
-    if teamId >= 401 and teamId <= 499:
-        return 3
-    if teamId >= 601 and teamId <= 699:
-        return 4
-
-warning = False
-for name in (CLASSFILE, PERSONFILE, TEAMFILE):
-    if os.path.isfile(name):
-        warning = True
-        print("Warning! {} already exists!".format(name))
-
-if warning:
-    if input("The above configuration files already exist. Do you really want to overwrite? [y/N]: ").upper() != "Y":
-        print("Existing files untouched.")
-        sys.exit(-1)
-
 
-for k,v in options.items():
-    print("{:<14}: {}".format(descriptions[k], v))
+    if error:
+        show_usage()
+        sys.exit(-1)
 
-for i in range(101, 101 + MEN_SOLO):
-    bibs.append(i)
+    warning = False
+    for name in (CLASSFILE, PERSONFILE, TEAMFILE):
+        if os.path.isfile(name):
+            warning = True
+            print("Warning! {} already exists!".format(name))
 
-for i in range(201, 201 + LADIES_SOLO):
-    bibs.append(i)
+    if warning:
+        if input("The above configuration files already exist. Do you really want to overwrite? [y/N]: ").upper() != "Y":
+            print("Existing files untouched.")
+            sys.exit(-1)
 
-for i in range(301, 301 + TEAM_3_MIXED):
-    for m in range(1, 4):
-        bibs.append(i * 10 + m)
+    for k,v in options.items():
+        print("{:<14}: {}".format(descriptions[k], v))
 
-for i in range(401, 401 + TEAM_3_LADIES):
-    for m in range(1, 4):
-        bibs.append(i * 10 + m)
+    teams = create_teams(options)
 
-for i in range(601, 601 + TEAM_6_MIXED):
-    for m in range(1, 7):
-        bibs.append(i * 10 + m)
+    write_classes(CLASSFILE)
+    print("Created %s" % (CLASSFILE))
 
+    write_persons(PERSONFILE, teams)
+    print("Created %s" % (PERSONFILE))
 
-with open(CLASSFILE, 'w') as f:
-    f.write("0,1,Herr solo\n")
-    f.write("1,1,Dam solo\n")
-    f.write("2,3,Mixed 3\n")
-    f.write("3,3,Dam 3\n")
-    f.write("4,6,Mixed 6\n")
-print("Created %s" % (CLASSFILE))
+    write_teams(TEAMFILE, teams)
+    print("Created %s" % (TEAMFILE))
 
-with open(PERSONFILE, 'w') as f:
-    for i in bibs:
-        if i < 1000:
-            f.write("s,%d,%d,Person %d\n" % (classId(i), i, i))
-        else:
-            f.write("%d,Person %d\n" % (i, i))
-print("Created %s" % (PERSONFILE))
-
-teams = {}
-for bib in bibs:
-    if bib > 3010:
-        teamId = bib / 10
-        if not teamId in teams:
-            teams[teamId] = []
-        teams[teamId].append(bib)
-
-with open(TEAMFILE, 'w') as f:
-    for teamId in teams:
-        text = "%d,Team %d" % (classId(teamId), teamId)
-        for bib in teams[teamId]:
-            text += ",%d" % (bib)
-        text += "\n"
-        f.write(text)
-
-print("Created %s" % (TEAMFILE))
+if __name__ == '__main__':
+    main()
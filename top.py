@@ -13,8 +13,19 @@
 import lmcore
 import args
 import argparse
+import csv
+import hashlib
+import json
+import multiprocessing
 import os
 import re
+import sys
+
+# Name of the file in each year directory that holds the summary of the year
+CACHEFILE = 'top-cache.json'
+CACHE_VERSION = 1
+# Files in each year directory that the summary is made from
+SOURCES = [args.CLASSFILE, args.PERSONFILE, args.TEAMFILE, args.LOGFILE]
 
 class JsObject(object):
 	def __init__(self, *args, **kwargs):
@@ -52,8 +63,8 @@ class JsObject(object):
 		return self.__dict__.__str__()
 
 def time_to_string(seconds):
-    h = int(seconds) / 3600
-    m = (int(seconds) - h * 3600) / 60
+    h = int(seconds) // 3600
+    m = (int(seconds) - h * 3600) // 60
     s = int(seconds) - h * 3600 - m * 60
     return "%02d:%02d:%02d" % (h, m, s)
 
@@ -146,56 +157,223 @@ def write_yearly_reports(summaries):
         write_file("%d_total_top.csv" % (year),
                    get_best_laps_total_csv(summaries[year]))
 
-def get_summaries():
-    dirs = find_dirs()
-    summaries = {}
-    for d in sorted(dirs, key=lambda x: x.Year):
-        print("Processing %d in %s" % (d.Year, d.Dir))
-        config = lmcore.loadConfig(d.Dir + "/classes.csv",
-                                   d.Dir + "/persons.csv",
-                                   d.Dir + "/teams.csv")
-        if not config:
+def file_digest(path):
+    digest = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Returns a mapping from the name of each source file in directory to its
+# modification time and MD5 digest. Files missing in directory are left out.
+# A digest is only calculated if the modification time differs from the one
+# in old, so that unchanged years cost one stat per file.
+def get_sources(directory, old={}):
+    sources = {}
+    for name in SOURCES:
+        path = os.path.join(directory, name)
+        if not os.path.isfile(path):
+            continue
+        mtime = os.stat(path).st_mtime_ns
+        if name in old and old[name][0] == mtime:
+            sources[name] = old[name]
+        else:
+            sources[name] = [mtime, file_digest(path)]
+    return sources
+
+def same_sources(a, b):
+    if set(a.keys()) != set(b.keys()):
+        return False
+    for name in a:
+        if a[name][1] != b[name][1]:
+            return False
+    return True
+
+# Returns the cached summary of directory, or None if there is none or if
+# any source file has changed since it was made.
+def load_cached_summary(directory):
+    path = os.path.join(directory, CACHEFILE)
+    try:
+        with open(path, 'r') as f:
+            cache = json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+    if cache.get('version') != CACHE_VERSION:
+        return None
+    sources = get_sources(directory, cache['sources'])
+    if not same_sources(sources, cache['sources']):
+        return None
+    if sources != cache['sources']:
+        # Touched but not changed, remember the new times
+        save_cached_summary(directory, sources, cache['summary'])
+    return cache['summary']
+
+def save_cached_summary(directory, sources, data):
+    path = os.path.join(directory, CACHEFILE)
+    try:
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'version': CACHE_VERSION,
+                       'sources': sources,
+                       'summary': data}, f)
+        os.replace(path + '.tmp', path)
+    except (IOError, OSError) as e:
+        print("Could not write %s: %s" % (path, e))
+
+def summary_to_data(summary):
+    return [{'Name': info.Name, 'AllLaps': info.AllLaps,
+             'LapCount': info.LapCount, 'BestLaps': info.BestLaps}
+            for info in summary.Data]
+
+def data_to_summary(data):
+    summary = JsObject()
+    summary.Data = [JsObject(info) for info in data]
+    return summary
+
+# Replays the log of the race in directory and returns the summary as plain
+# data, or False if the config could not be loaded and None if there is no
+# log. Runs in a worker process, so the summary is saved to the cache here.
+def summarize_dir(directory):
+    print("Processing %s" % (directory))
+    sources = get_sources(directory)
+    config = lmcore.loadConfig(os.path.join(directory, args.CLASSFILE),
+                               os.path.join(directory, args.PERSONFILE),
+                               os.path.join(directory, args.TEAMFILE))
+    if not config:
+        return False
+
+    report = lmcore.Report(config)
+    if not load_result(os.path.join(directory, args.LOGFILE), report):
+        return None
+    data = summary_to_data(get_personal_top(config, report))
+    save_cached_summary(directory, sources, data)
+    return data
+
+# Returns a mapping from year to summary for all race directories. Years
+# whose source files have not changed since the last run are read from
+# their cache, the others are processed in parallel by processes workers.
+def get_summaries(processes=1, useCache=True):
+    dirs = sorted(find_dirs(), key=lambda x: x.Year)
+    datas = {}
+    todo = []
+    for d in dirs:
+        data = load_cached_summary(d.Dir) if useCache else None
+        if data is None:
+            todo.append(d)
+        else:
+            print("Using cached summary of %d in %s" % (d.Year, d.Dir))
+            datas[d.Year] = data
+
+    directories = [d.Dir for d in todo]
+    if processes > 1 and len(todo) > 1:
+        pool = multiprocessing.Pool(min(processes, len(todo)))
+        try:
+            results = pool.map(summarize_dir, directories)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [summarize_dir(directory) for directory in directories]
+
+    for d, data in zip(todo, results):
+        if data is False:
             sys.exit(1)
+        if data is not None:
+            datas[d.Year] = data
 
-        report = lmcore.Report(config)
-        if not load_result(d.Dir + "/log.csv", report):
-            continue
-        summaries[d.Year] = get_personal_top(config, report)
+    summaries = {}
+    for year, data in datas.items():
+        summaries[year] = data_to_summary(data)
     return summaries
 
-def find_all_persons_over_years(summaries):
-    persons = set()
+# Returns the key persons are indexed by, so that the same person is found
+# over the years even if case or spacing of the name differs.
+def normalize_name(name):
+    return " ".join(name.split()).lower()
+
+# Indexes summaries by person in a single pass. Returns a mapping from
+# normalized name to an object with the Name of the person, as written the
+# latest year, and Years, a mapping from year to the summary data of the
+# person that year. If a name occurs twice in a year, the person with the
+# most laps is kept.
+def index_careers(summaries):
+    careers = {}
     for year in sorted(summaries.keys()):
-        summary = summaries[year]
-        for person in sorted(summary.Data, key=lambda x: x.Name):
-            persons.add(person.Name)
-    return list(persons)
-
-def write_super_summary(summaries):
-    persons = find_all_persons_over_years(summaries)
-
-    text = "Name,"
+        for data in summaries[year].Data:
+            key = normalize_name(data.Name)
+            career = careers.get(key)
+            if career is None:
+                career = JsObject(Name=data.Name, Years={})
+                careers[key] = career
+            old = career.Years.get(year)
+            if old is None or data.LapCount > old.LapCount:
+                career.Name = data.Name
+                career.Years[year] = data
+    return careers
+
+# Returns a list of (year, data) for all years that the person called name
+# participated in, oldest first.
+def get_career(careers, name):
+    career = careers.get(normalize_name(name))
+    if career is None:
+        return []
+    return sorted(career.Years.items())
+
+def write_super_summary(summaries, careers=None):
+    if careers is None:
+        careers = index_careers(summaries)
     years = sorted(summaries.keys())
-    for year in years:
-        text += '"Laps %d","Best lap %d","Best time %d",' % (year, year, year)
-    text += "\n"
-
-    for person in sorted(persons):
-        text += '"%s",' % (person)
+    with open("super_summary.csv", "w") as f:
+        writer = csv.writer(f, quoting=csv.QUOTE_NONNUMERIC,
+                            lineterminator="\n")
+        header = ["Name"]
         for year in years:
-            participated = False
-            for data in summaries[year].Data:
-                if data.Name == person:
-                    participated = True
-                    text += "%d," % (data.LapCount)
-                    if len(data.BestLaps) > 0:
-                        text += '%d,"%s",' % (data.BestLaps[0][0],
-                                              time_to_string(data.BestLaps[0][1]))
-            if not participated:
-                text += '"","","",'
-        text += "\n"
-    write_file("super_summary.csv", text)
-
-summaries = get_summaries()
-write_yearly_reports(summaries)
-write_super_summary(summaries)
+            header += ["Laps %d" % (year), "Best lap %d" % (year),
+                       "Best time %d" % (year)]
+        writer.writerow(header)
+
+        for career in sorted(careers.values(), key=lambda x: x.Name):
+            row = [career.Name]
+            for year in years:
+                data = career.Years.get(year)
+                if data is None:
+                    row += ["", "", ""]
+                elif len(data.BestLaps) > 0:
+                    row += [data.LapCount, data.BestLaps[0][0],
+                            time_to_string(data.BestLaps[0][1])]
+                else:
+                    row += [data.LapCount, "", ""]
+            writer.writerow(row)
+
+def print_career(careers, name):
+    career = get_career(careers, name)
+    if len(career) == 0:
+        print("%s has not participated" % (name))
+        return
+    for year, data in career:
+        best = ""
+        if len(data.BestLaps) > 0:
+            best = time_to_string(data.BestLaps[0][1])
+        print("%d %-30s %4d %s" % (year, data.Name, data.LapCount, best))
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Lists the top performances '
+                                     'in all ml12h-YYYY directories.')
+    parser.add_argument('-j', metavar='jobs', type=int,
+                        default=multiprocessing.cpu_count(),
+                        help='Number of processes to replay races with. '
+                        'Default is the number of CPUs.')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Replay all races, even those with an up to '
+                        'date %s.' % (CACHEFILE))
+    parser.add_argument('--career', metavar='name',
+                        help='Only print the laps and best lap each year of '
+                        'the person called name.')
+    options = parser.parse_args()
+
+    summaries = get_summaries(options.j, not options.no_cache)
+    careers = index_careers(summaries)
+    if options.career:
+        print_career(careers, options.career)
+    else:
+        write_yearly_reports(summaries)
+        write_super_summary(summaries, careers)
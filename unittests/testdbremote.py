@@ -0,0 +1,118 @@
+import unittest
+import threading
+import xmlrpc.client
+from xmlrpc.server import SimpleXMLRPCServer, SimpleXMLRPCRequestHandler
+from db_utils.db_base import RemoteDB
+from db_utils.db_cmd import CmdDeleteBibs
+
+RACE_ID = 7
+
+class RequestHandler(SimpleXMLRPCRequestHandler):
+    rpc_paths = ('/xmlrpc.php',)
+
+    def do_POST(self):
+        self.server.Requests += 1
+        SimpleXMLRPCRequestHandler.do_POST(self)
+
+    def log_message(self, format, *args):
+        pass
+
+# Answers calls of unknown methods with the fault the sign up system gives,
+# where SimpleXMLRPCServer would use fault code 1
+class UnknownMethods:
+    def _dispatch(self, method, params):
+        raise xmlrpc.client.Fault(-32601, 'server error. requested method '
+                                  '%s does not exist.' % (method))
+
+# Stand-in for the sign up system, which keeps the bibs of its riders
+class FakeServer:
+    def __init__(self, multicall=True):
+        self.Riders = {'1': {'name': 'Anna', 'bib': '101'},
+                       '2': {'name': 'Bo', 'bib': '102'},
+                       '3': {'name': 'Cia', 'bib': ''}}
+        self.Server = SimpleXMLRPCServer(('localhost', 0),
+                                         requestHandler=RequestHandler,
+                                         logRequests=False, allow_none=True)
+        self.Server.Requests = 0
+        self.Server.register_function(self.set_bib,
+                                      'ml12h_racetimer_set_bib')
+        self.Server.register_function(self.get_teams_riders,
+                                      'ml12h_racetimer_get_teams_riders')
+        if multicall:
+            self.Server.register_multicall_functions()
+        self.Server.register_instance(UnknownMethods())
+        self.Thread = threading.Thread(target=self.Server.serve_forever)
+        self.Thread.daemon = True
+        self.Thread.start()
+
+    def url(self):
+        return 'http://localhost:%d' % (self.Server.server_address[1])
+
+    def requests(self):
+        return self.Server.Requests
+
+    def stop(self):
+        self.Server.shutdown()
+        self.Server.server_close()
+
+    def set_bib(self, race_id, rider_id, bib):
+        rider = self.Riders.get(str(rider_id))
+        if race_id != RACE_ID or rider is None:
+            raise xmlrpc.client.Fault(1, 'No rider %s' % (rider_id))
+        rider['bib'] = str(bib)
+        return {'name': rider['name'], 'bib': rider['bib']}
+
+    def get_teams_riders(self, race_id):
+        return self.Riders
+
+class TestRemoteDB(unittest.TestCase):
+    def setUp(self):
+        self.Server = None
+
+    def tearDown(self):
+        if self.Server:
+            self.Server.stop()
+
+    def start(self, multicall=True):
+        self.Server = FakeServer(multicall)
+        self.DB = RemoteDB(self.Server.url(), '', RACE_ID)
+        self.DB.BATCH_SIZE = 2
+
+    def test_batches(self):
+        self.start()
+        results = self.DB.SetRiderBibs([('1', 201), ('2', 202), ('3', 203)])
+        self.assertEqual(['201', '202', '203'], [r['bib'] for r in results])
+        self.assertEqual(2, self.Server.requests())
+
+    def test_failed_change(self):
+        self.start()
+        results = self.DB.SetRiderBibs([('1', 201), ('9', 209)])
+        self.assertEqual('201', results[0]['bib'])
+        self.assertTrue(isinstance(results[1], xmlrpc.client.Fault))
+
+    def test_without_multicall(self):
+        self.start(False)
+        results = self.DB.SetRiderBibs([('1', 201), ('9', 209), ('3', 203)])
+        self.assertEqual('201', results[0]['bib'])
+        self.assertTrue(isinstance(results[1], xmlrpc.client.Fault))
+        self.assertEqual('203', results[2]['bib'])
+        self.assertFalse(self.DB.multicall)
+
+    def test_failed_multicall(self):
+        self.start()
+        def multicall(calls):
+            raise xmlrpc.client.Fault(1, 'Temporary error')
+        self.Server.Server.register_function(multicall, 'system.multicall')
+        results = self.DB.SetRiderBibs([('1', 201), ('9', 209)])
+        self.assertEqual('201', results[0]['bib'])
+        self.assertTrue(isinstance(results[1], xmlrpc.client.Fault))
+        self.assertTrue(self.DB.multicall)
+
+    def test_delete_bibs(self):
+        self.start()
+        self.DB.BATCH_SIZE = 50
+        CmdDeleteBibs(self.DB).execute(['deletebibs'])
+        self.assertEqual(['', '', ''], [r['bib'] for r in
+                                        self.Server.Riders.values()])
+        # One request to get the riders and one with the changes
+        self.assertEqual(2, self.Server.requests())
@@ -1,6 +1,8 @@
 import unittest
 import os
+import xmlrpc.client
 from db_utils import Uploader
+from db_utils.db_base import NetworkError
 
 TEST_FILE_NAME = '/tmp/db_utils_unittest.csv'
 
@@ -30,6 +32,37 @@ class FakeDB:
         return {"deleted": 0, "added": [{"bib": 101, "passage": 59}], "messages": []}
 
 
+class FakeAppendDB(FakeDB):
+    def __init__(self):
+        FakeDB.__init__(self)
+        self.Appended = []
+
+    def UploadData(self, data):
+        self.Appended = []
+        return FakeDB.UploadData(self, data)
+
+    def AppendData(self, data):
+        self.Appended.append(data)
+        return {"deleted": 0, "added": [], "messages": []}
+
+
+class FakeOldDB(FakeDB):
+    def AppendData(self, data):
+        raise xmlrpc.client.Fault(-32601, "Method not found")
+
+
+class FakeFailingAppendDB(FakeAppendDB):
+    def AppendData(self, data):
+        raise xmlrpc.client.Fault(1, "Temporary error")
+
+
+# Adds the laps but the answer is lost on the way back
+class FakeLostAnswerDB(FakeAppendDB):
+    def AppendData(self, data):
+        FakeAppendDB.AppendData(self, data)
+        raise NetworkError()
+
+
 class TestDbUpload(unittest.TestCase):
     def setUp(self):
         self.File = TestFile(TEST_FILE_NAME)
@@ -61,3 +94,75 @@ class TestDbUpload(unittest.TestCase):
                          "1408987200\t101\n" + 
                          "1408987400\t102",
                          db.Data)
+
+    def test_only_new_lines_are_appended(self):
+        self.File.writeline('1408987100.0,start all');
+        self.File.writeline('1408987200.0,101');
+        db = FakeAppendDB()
+        uploader = Uploader(db, TEST_FILE_NAME, 10)
+        uploader._upload()
+        self.File.writeline('1408987300.0,102');
+        self.File.writeline('1408987400.0,103');
+        uploader._upload()
+        uploader._upload()
+        self.assertEqual("1408987100\tall\n" +
+                         "1408987200\t101",
+                         db.Data)
+        self.assertEqual(["1408987300\t102\n" +
+                          "1408987400\t103"],
+                         db.Appended)
+
+    def test_all_lines_are_uploaded_when_uploaded_lines_change(self):
+        self.File.writeline('1408987100.0,start all');
+        self.File.writeline('1408987200.0,101');
+        db = FakeAppendDB()
+        uploader = Uploader(db, TEST_FILE_NAME, 10)
+        uploader._upload()
+        with open(TEST_FILE_NAME, 'w') as f:
+            f.write('1408987100.0,start all' + os.linesep)
+            f.write('1408987200.0,102' + os.linesep)
+            f.write('1408987300.0,103' + os.linesep)
+        uploader._upload()
+        self.assertEqual("1408987100\tall\n" +
+                         "1408987200\t102\n" +
+                         "1408987300\t103",
+                         db.Data)
+        self.assertEqual([], db.Appended)
+
+    def test_server_without_append(self):
+        self.File.writeline('1408987100.0,start all');
+        db = FakeOldDB()
+        uploader = Uploader(db, TEST_FILE_NAME, 10)
+        uploader._upload()
+        self.File.writeline('1408987200.0,101');
+        uploader._upload()
+        self.assertEqual("1408987100\tall\n" +
+                         "1408987200\t101",
+                         db.Data)
+        self.assertFalse(uploader.CanAppend)
+
+    def test_failed_append_uploads_all_once(self):
+        self.File.writeline('1408987100.0,start all');
+        db = FakeFailingAppendDB()
+        uploader = Uploader(db, TEST_FILE_NAME, 10)
+        uploader._upload()
+        self.File.writeline('1408987200.0,101');
+        uploader._upload()
+        self.assertEqual("1408987100\tall\n" +
+                         "1408987200\t101",
+                         db.Data)
+        self.assertTrue(uploader.CanAppend)
+
+    def test_lost_append_answer_uploads_all(self):
+        self.File.writeline('1408987100.0,start all');
+        db = FakeLostAnswerDB()
+        uploader = Uploader(db, TEST_FILE_NAME, 10)
+        uploader._upload()
+        self.File.writeline('1408987200.0,101');
+        uploader._upload()
+        self.assertEqual(["1408987200\t101"], db.Appended)
+        uploader._upload()
+        self.assertEqual("1408987100\tall\n" +
+                         "1408987200\t101",
+                         db.Data)
+        self.assertEqual([], db.Appended)
@@ -0,0 +1,136 @@
+import unittest
+import os
+import gzip
+import time
+import signal
+import shutil
+import tempfile
+import lmcore
+import htmlgen
+
+CLASSES = 'test-data/classes-test.csv'
+PERSONS = 'test-data/persons-test.csv'
+TEAMS = 'test-data/teams-test.csv'
+START = 1314227943
+
+class TestHTMLGenerator(unittest.TestCase):
+    def setUp(self):
+        self.OutputDir = tempfile.mkdtemp()
+        self.Config = lmcore.loadConfig(CLASSES, PERSONS, TEAMS)
+        self.Report = lmcore.Report(self.Config)
+        self.Generator = htmlgen.HTMLGenerator(self.Config, self.Report,
+                                               self.OutputDir)
+        self.Report.update("%d,start all" % (START))
+        self.Generator.createPages(0)
+
+    def tearDown(self):
+        shutil.rmtree(self.OutputDir)
+
+    def pagesWithStamp(self, stamp):
+        return sorted([page for page, s in self.Generator.PageStamps.items()
+                       if s == str(stamp)])
+
+    def test_first_call_writes_all_pages(self):
+        self.assertEqual(len(self.Config.getPersonBibList()) + 3,
+                         len(self.pagesWithStamp(0)))
+
+    def test_only_affected_pages_are_written(self):
+        self.Report.update("%d,1" % (START + 1))
+        self.Generator.createPages(1)
+        self.Report.update("%d,3" % (START + 11))
+        self.Generator.createPages(2)
+        # Team 3 passed, team 1 is above it and team 2 below it
+        self.assertEqual(['c1.html', 'index.html', 'logtail.html',
+                          'p1.html', 'p2.html', 'p3.html', 'speaker.html'],
+                         self.pagesWithStamp(2))
+        self.assertEqual('0', self.Generator.getPageStamp('p4.html'))
+
+    def test_full_rebuild(self):
+        pages = self.pagesWithStamp(0)
+        self.Report.update("%d,1" % (START + 1))
+        self.Generator.createPages(1, full=True)
+        self.assertEqual(sorted(pages + ['c1.html']), self.pagesWithStamp(1))
+
+    def test_full_rebuild_after_reset(self):
+        self.Report.reset()
+        self.Generator.createPages(1)
+        self.assertEqual([], self.pagesWithStamp(0))
+
+    def test_parallel_full_rebuild(self):
+        self.Report.update("%d,1" % (START + 1))
+        self.Report.update("%d,3" % (START + 11))
+        self.Generator.createPages(1, full=True)
+        pages = self.pagesWithStamp(1)
+        parallelDir = tempfile.mkdtemp()
+        try:
+            generator = htmlgen.HTMLGenerator(self.Config, self.Report,
+                                              parallelDir, 2)
+            generator.createPages(1, full=True)
+            generator.close()
+            self.assertEqual(generator.PageStamps, self.Generator.PageStamps)
+            for page in pages:
+                with open(os.path.join(self.OutputDir, page)) as f:
+                    expected = f.read()
+                with open(os.path.join(parallelDir, page)) as f:
+                    self.assertEqual(expected, f.read())
+            self.assertEqual(sorted(pages), sorted(os.listdir(parallelDir)))
+        finally:
+            shutil.rmtree(parallelDir)
+
+    def test_parallel_rebuild_after_reset(self):
+        parallelDir = tempfile.mkdtemp()
+        generator = htmlgen.HTMLGenerator(self.Config, self.Report,
+                                          parallelDir, 2)
+        try:
+            generator.createPages(1)
+            # The workers get the report as it is at each full rebuild
+            self.Report.reset()
+            self.Report.update("%d,start all" % (START))
+            self.Report.update("%d,1" % (START + 1))
+            self.Generator.createPages(2)
+            generator.createPages(2)
+            self.assertEqual(self.Generator.PageStamps, generator.PageStamps)
+            for page in ['c1.html', 'p1.html', 'p2.html']:
+                with open(os.path.join(self.OutputDir, page)) as f:
+                    expected = f.read()
+                with open(os.path.join(parallelDir, page)) as f:
+                    self.assertEqual(expected, f.read())
+        finally:
+            generator.close()
+            shutil.rmtree(parallelDir)
+
+    def test_stopped_worker(self):
+        generator = htmlgen.HTMLGenerator(self.Config, self.Report,
+                                          self.OutputDir, 2)
+        os.kill(generator.Pool.submit(os.getpid).result(), signal.SIGKILL)
+        time.sleep(0.1)
+        self.Report.update("%d,1" % (START + 1))
+        generator.createPages(1, full=True)
+        self.assertEqual(None, generator.Pool)
+        self.assertEqual(['1'], list(set(generator.PageStamps.values())))
+
+    def test_pages_in_cache_only(self):
+        cache = htmlgen.PageCache()
+        generator = htmlgen.HTMLGenerator(self.Config, self.Report, None,
+                                          cache=cache)
+        generator.createPages(1)
+        self.assertEqual(sorted(generator.PageStamps.keys()),
+                         sorted(cache.Pages.keys()))
+        page = cache.get('index.html')
+        self.assertEqual('1', page.VersionStamp)
+        self.assertEqual(page.Data, gzip.decompress(page.GzipData))
+        self.assertTrue('versionstamp="1"' in page.Text)
+        self.assertEqual(None, cache.get('missing.html'))
+
+    def test_parallel_pages_in_cache(self):
+        cache = htmlgen.PageCache()
+        generator = htmlgen.HTMLGenerator(self.Config, self.Report, None, 2,
+                                          cache)
+        generator.createPages(1)
+        generator.close()
+        self.assertEqual(sorted(generator.PageStamps.keys()),
+                         sorted(cache.Pages.keys()))
+        with open(os.path.join(self.OutputDir, 'p1.html')) as f:
+            self.assertEqual(f.read().replace('versionstamp="0"',
+                                              'versionstamp="1"'),
+                             cache.get('p1.html').Text)
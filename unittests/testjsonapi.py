@@ -0,0 +1,101 @@
+import unittest
+import shutil
+import tempfile
+import lmcore
+import htmlgen
+import jsonapi
+
+CLASSES = 'test-data/classes-test.csv'
+PERSONS = 'test-data/persons-test.csv'
+TEAMS = 'test-data/teams-test.csv'
+START = 1314227943
+
+class TestJSONGenerator(unittest.TestCase):
+    def setUp(self):
+        self.Config = lmcore.loadConfig(CLASSES, PERSONS, TEAMS)
+        self.Report = lmcore.Report(self.Config)
+        self.HTML = htmlgen.HTMLGenerator(self.Config, self.Report, None)
+        self.Generator = jsonapi.JSONGenerator(self.Config, self.Report,
+                                               self.HTML)
+        self.Report.update("%d,start all" % (START))
+        self.Stamp = 0
+        self.Generator.update(self.Stamp)
+
+    def lap(self, offset, bib):
+        self.Report.update("%d,%d" % (START + offset, bib))
+        self.Stamp += 1
+        self.Generator.update(self.Stamp)
+
+    def classOf(self, data, classId):
+        for clazz in data['classes']:
+            if clazz['id'] == classId:
+                return clazz
+        return None
+
+    def test_full_standings(self):
+        self.lap(1, 1)
+        data = self.Generator.getStandings()
+        self.assertTrue(data['full'])
+        self.assertEqual(1, data['stamp'])
+        clazz = self.classOf(data, 1)
+        self.assertEqual([1], clazz['order'])
+        self.assertEqual(self.HTML.getStandingRow(1), clazz['teams'][0])
+
+    def test_standings_since(self):
+        self.lap(1, 1)
+        self.lap(11, 3)
+        self.lap(12, 5)
+        data = self.Generator.getStandings(2)
+        self.assertFalse(data['full'])
+        self.assertEqual([5], [row['id'] for row in
+                               self.classOf(data, 2)['teams']])
+        self.assertEqual([], self.classOf(data, 1)['teams'])
+        self.assertFalse('order' in self.classOf(data, 1))
+
+    def test_team_that_is_passed_changes(self):
+        self.lap(1, 1)
+        self.lap(11, 3)
+        self.lap(21, 3)
+        data = self.Generator.getStandings(2)
+        # Team 3 passed team 1, so the rank of both changed
+        self.assertEqual([3, 1], self.classOf(data, 1)['order'])
+        self.assertEqual([3, 1], [row['id'] for row in
+                                  self.classOf(data, 1)['teams']])
+
+    def test_log_tail_since(self):
+        self.lap(1, 1)
+        self.lap(11, 3)
+        self.lap(21, 3)
+        data = self.Generator.getLogTail(1)
+        self.assertFalse(data['full'])
+        # All rows, with the current rank and lap count of older laps
+        self.assertEqual([self.HTML.getLogTailRow(START + 21, 3),
+                          self.HTML.getLogTailRow(START + 11, 3),
+                          self.HTML.getLogTailRow(START + 1, 1)],
+                         data['laps'])
+        self.assertEqual('2', data['laps'][1]['laps'])
+        self.assertEqual(data, self.Generator.getLogTail(3))
+        self.assertEqual(3, len(self.Generator.getSpeaker(3)['laps']))
+
+    def test_team_laps_since(self):
+        self.lap(1, 1)
+        self.lap(11, 3)
+        self.lap(21, 1)
+        data = self.Generator.getTeamLaps(1, 2)
+        self.assertEqual([2], [lap['lap'] for lap in data['laps']])
+        # The lead of the first lap of team 1 was set when team 3 passed
+        data = self.Generator.getTeamLaps(1, 1)
+        self.assertEqual([1, 2], [lap['lap'] for lap in data['laps']])
+        self.assertEqual(None, self.Generator.getTeamLaps(99))
+
+    def test_reset_gives_full_answers(self):
+        self.lap(1, 1)
+        self.Report.reset()
+        self.Report.update("%d,start all" % (START))
+        self.lap(5, 3)
+        self.assertTrue(self.Generator.getStandings(1)['full'])
+        self.assertFalse(self.Generator.getStandings(2)['full'])
+
+    def test_unknown_stamp_gives_full_answer(self):
+        self.lap(1, 1)
+        self.assertTrue(self.Generator.getStandings(5)['full'])
@@ -0,0 +1,64 @@
+import unittest
+import os
+import shutil
+import tempfile
+import top
+
+CLASSES = 'test-data/classes-test.csv'
+PERSONS = 'test-data/persons-test.csv'
+TEAMS = 'test-data/teams-test.csv'
+START = 1314227943
+
+class TestSummaryCache(unittest.TestCase):
+    def setUp(self):
+        self.Dir = tempfile.mkdtemp()
+        shutil.copy(CLASSES, os.path.join(self.Dir, 'classes.csv'))
+        shutil.copy(PERSONS, os.path.join(self.Dir, 'persons.csv'))
+        shutil.copy(TEAMS, os.path.join(self.Dir, 'teams.csv'))
+        self.Log = os.path.join(self.Dir, 'log.csv')
+        with open(self.Log, 'w') as f:
+            f.write("%d,start all\n%d,1\n%d,1\n" % (START, START + 60,
+                                                   START + 150))
+
+    def tearDown(self):
+        shutil.rmtree(self.Dir)
+
+    def test_summary_is_cached(self):
+        self.assertEqual(None, top.load_cached_summary(self.Dir))
+        data = top.summarize_dir(self.Dir)
+        self.assertEqual(2, data[0]['LapCount'])
+        self.assertEqual(2, top.load_cached_summary(self.Dir)[0]['LapCount'])
+
+    def test_touched_log_keeps_cache(self):
+        top.summarize_dir(self.Dir)
+        os.utime(self.Log, (START, START))
+        self.assertNotEqual(None, top.load_cached_summary(self.Dir))
+
+    def test_changed_log_invalidates_cache(self):
+        top.summarize_dir(self.Dir)
+        with open(self.Log, 'a') as f:
+            f.write("%d,1\n" % (START + 200))
+        os.utime(self.Log, (START, START))
+        self.assertEqual(None, top.load_cached_summary(self.Dir))
+
+def person(name, lapCount, bestLap):
+    return top.JsObject(Name=name, LapCount=lapCount, AllLaps=[],
+                        BestLaps=[bestLap])
+
+class TestCareers(unittest.TestCase):
+    def setUp(self):
+        self.Summaries = {
+            2015: top.JsObject(Data=[person("Anna S", 10, (2, 600.0)),
+                                     person("Bo T", 5, (3, 700.0))]),
+            2016: top.JsObject(Data=[person("anna  s", 12, (4, 590.0))])}
+
+    def test_same_person_over_years(self):
+        careers = top.index_careers(self.Summaries)
+        self.assertEqual(2, len(careers))
+        career = top.get_career(careers, "ANNA S")
+        self.assertEqual([2015, 2016], [year for year, data in career])
+        self.assertEqual("anna  s", careers[top.normalize_name("Anna S")].Name)
+        self.assertEqual([], top.get_career(careers, "Nobody"))
+
+    def test_time_to_string(self):
+        self.assertEqual("01:02:03", top.time_to_string(3723.4))